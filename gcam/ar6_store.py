@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+@author: nich980
+
+Readers for the global AR6 harmonized emissions database. get_model_df reads
+the CSV file directly; AR6Store ingests it once into a columnar store
+partitioned by model & scenario, so that later reads only load the partitions
+they need.
+"""
+
+import pickle
+import numpy as np
+import pandas as pd
+
+from glob import glob
+from os import makedirs, remove, replace, stat
+from os.path import join, basename, exists
+
+
+def year_columns(model_df):
+    """
+    Get the year columns of a DataFrame returned by get_model_df. Year
+    columns are labelled with int years; every other column is an identifier
+    
+    Return
+    -------
+    list of int
+    """
+    return [col for col in model_df.columns if isinstance(col, (int, np.integer))]
+
+
+
+def _isin(series, values):
+    if (isinstance(values, str)):
+        values = [values]
+    return series.isin(values).to_numpy()
+
+
+
+def get_model_df(abs_path, model='all', scenario=None, chunksize=100000):
+    """
+    Read global AR6 dataset into a Pandas DataFrame
+    
+    Parameters
+    -----------
+    abs_path : str
+        Absolute path of the data file to read
+    model : str or list of str, optional
+        Model data to return. Ex: if model = 'GCAM', only GCAM model
+        data will be returned in the DataFrame. Default is 'all'.
+    scenario : str or list of str, optional
+        Scenarios to return. Default is all scenarios
+    chunksize : int, optional
+        Number of rows read at a time. Rows of other models & scenarios are
+        dropped from each chunk as it is read
+        
+    Return
+    -------
+    model_df : Pandas DataFrame
+        Columns: the identifier columns of the file, with 'Variable' replaced
+        by categorical 'EM_Species' & 'EM_SubSpecies' columns, followed by one
+        column per year labelled with the int year (see year_columns)
+    """
+    cols = pd.read_csv(abs_path, sep=',', header=0, nrows=0).columns.tolist()
+    id_cols = [col for col in cols if not col.isdigit()]
+    col_types = {col: str for col in id_cols}
+    
+    frames = []
+    for chunk in pd.read_csv(abs_path, sep=',', header=0, dtype=col_types, chunksize=chunksize):
+        mask = np.ones(len(chunk), dtype=bool)
+        if (model != 'all'):
+            mask &= _isin(chunk['Model'], model)
+        if (scenario):
+            mask &= _isin(chunk['Scenario'], scenario)
+        frames.append(chunk[mask])
+    model_df = pd.concat(frames, ignore_index=True)
+    
+    for col in id_cols:
+        model_df[col] = model_df[col].astype('category')
+    
+    # Split the variable names into species & sub-species once per unique
+    # variable, Ex: "Emissions|HFC|HFC125" --> "HFC", "HFC125"
+    variables = model_df['Variable'].cat.categories
+    parts = variables.str.replace("Emissions|", "", regex=False).str.split('|', n=2, expand=True)
+    if (not isinstance(parts, pd.MultiIndex)):
+        parts = pd.MultiIndex.from_arrays([parts])
+    em_species = np.asarray(parts.get_level_values(0), dtype=object)
+    if (parts.nlevels > 1):
+        em_subspecies = np.asarray(parts.get_level_values(1), dtype=object)
+        em_subspecies = np.where(pd.isnull(em_subspecies), em_species, em_subspecies)
+    else:
+        em_subspecies = em_species
+    codes = model_df['Variable'].cat.codes.to_numpy()
+    var_idx = id_cols.index('Variable')
+    model_df.insert(var_idx, 'EM_Species', pd.Categorical(em_species[codes]))
+    model_df.insert(var_idx + 1, 'EM_SubSpecies', pd.Categorical(em_subspecies[codes]))
+    model_df = model_df.drop("Variable", axis=1)
+    
+    # Label the year columns with int years
+    model_df.columns = [int(col) if col.isdigit() else col for col in model_df.columns]
+    
+    return model_df
+
+
+
+class AR6Store:
+    """
+    Columnar copy of the AR6 database, partitioned by model & scenario. Each
+    partition holds the category codes of the identifier columns & a matrix
+    of yearly values; the categories are shared by every partition & kept in
+    the store manifest
+    """
+    
+    def __init__(self, abs_path, store_dir=None):
+        """
+        Constructor for the AR6Store class
+        
+        Parameters
+        -----------
+        abs_path : str
+            Absolute path of the AR6 CSV file
+        store_dir : str, optional
+            Directory holding the store. Default is '<abs_path>.store'. The
+            store is rebuilt when the CSV file's modification time or size
+            changes
+        """
+        self.abs_path  = abs_path
+        self.store_dir = store_dir if store_dir else abs_path + '.store'
+        self._manifest = None
+        
+    def _source_key(self):
+        f_stat = stat(self.abs_path)
+        return (f_stat.st_mtime, f_stat.st_size)
+    
+    @property
+    def manifest(self):
+        """
+        Store manifest, ingesting the CSV file first if the store is missing
+        or out of date
+        """
+        key = self._source_key()
+        if (self._manifest is None or self._manifest['key'] != key):
+            manifest_path = join(self.store_dir, 'manifest.pkl')
+            manifest = None
+            if (exists(manifest_path)):
+                with open(manifest_path, 'rb') as f_in:
+                    manifest = pickle.load(f_in)
+            if (manifest is None or manifest['key'] != key):
+                manifest = self.ingest()
+            self._manifest = manifest
+        return self._manifest
+    
+    def ingest(self):
+        """
+        Read the CSV file & write every (model, scenario) partition. The
+        manifest is written last, so an interrupted ingest is redone
+        
+        Return
+        -------
+        dict
+            Store manifest
+        """
+        key = self._source_key()
+        model_df = get_model_df(self.abs_path)
+        years = year_columns(model_df)
+        id_cols = [col for col in model_df.columns if col not in years]
+        makedirs(self.store_dir, exist_ok=True)
+        for old_path in glob(join(self.store_dir, 'part-*.npz')):
+            remove(old_path)
+        categories = {col: model_df[col].cat.categories for col in id_cols}
+        # Sort the rows by (model, scenario) codes once & slice each partition
+        # out of the code & value matrices
+        codes  = np.column_stack([model_df[col].cat.codes.to_numpy() for col in id_cols])
+        values = model_df[years].to_numpy(dtype=float)
+        model_idx, scn_idx = id_cols.index('Model'), id_cols.index('Scenario')
+        order = np.lexsort((codes[:, scn_idx], codes[:, model_idx]))
+        codes, values = codes[order], values[order]
+        part_keys = codes[:, model_idx].astype(np.int64) * len(categories['Scenario']) + codes[:, scn_idx]
+        bounds = np.flatnonzero(np.diff(part_keys)) + 1
+        partitions = {}
+        for part_idx, (start, stop) in enumerate(zip(np.r_[0, bounds], np.r_[bounds, len(codes)])):
+            f_name = 'part-{:05d}.npz'.format(part_idx)
+            with open(join(self.store_dir, f_name), 'wb') as f_out:
+                np.savez(f_out, codes=codes[start:stop], values=values[start:stop])
+            part_key = (categories['Model'][codes[start, model_idx]],
+                        categories['Scenario'][codes[start, scn_idx]])
+            partitions[part_key] = f_name
+        manifest = {'key': key, 'id_cols': id_cols, 'years': years,
+                    'categories': categories,
+                    'partitions': partitions}
+        manifest_path = join(self.store_dir, 'manifest.pkl')
+        with open(manifest_path + '.tmp', 'wb') as f_out:
+            pickle.dump(manifest, f_out, protocol=pickle.HIGHEST_PROTOCOL)
+        replace(manifest_path + '.tmp', manifest_path)
+        print('Ingested {} partitions from {}'.format(len(partitions), basename(self.abs_path)))
+        return manifest
+    
+    @property
+    def models(self):
+        return sorted(set(part_key[0] for part_key in self.manifest['partitions']))
+    
+    def scenarios(self, model=None):
+        """
+        Get the scenarios in the store, or the scenarios of one model
+        """
+        return sorted(set(part_key[1] for part_key in self.manifest['partitions']
+                          if model is None or part_key[0] == model))
+    
+    def _read_partition(self, f_name):
+        """
+        Read the identifier codes & value matrix of one partition
+        
+        Return
+        -------
+        tuple of (Numpy array, Numpy array)
+            Identifier codes, one column per identifier column, & values,
+            one column per year
+        """
+        with np.load(join(self.store_dir, f_name)) as npz:
+            return (npz['codes'], npz['values'])
+    
+    def load(self, model='all', scenario=None, species=None):
+        """
+        Read data from the store. Only the partitions of the requested models
+        & scenarios are read
+        
+        Parameters
+        -----------
+        model : str or list of str, optional
+            Models to return. Default is 'all'
+        scenario : str or list of str, optional
+            Scenarios to return. Default is all scenarios
+        species : str or list of str, optional
+            Emission species to return, Ex: 'CH4'. Default is all species
+            
+        Return
+        -------
+        Pandas DataFrame
+            Same layout as get_model_df
+        """
+        manifest = self.manifest
+        models    = [model] if isinstance(model, str) else model
+        scenarios = [scenario] if isinstance(scenario, str) else scenario
+        f_names = [f_name for (part_model, part_scn), f_name in manifest['partitions'].items()
+                   if (model == 'all' or part_model in models) and
+                      (scenarios is None or part_scn in scenarios)]
+        parts = [self._read_partition(f_name) for f_name in sorted(f_names)]
+        id_cols = manifest['id_cols']
+        years   = manifest['years']
+        if (parts):
+            codes  = np.concatenate([part[0] for part in parts])
+            values = np.concatenate([part[1] for part in parts])
+        else:
+            codes  = np.zeros((0, len(id_cols)), dtype=int)
+            values = np.zeros((0, len(years)))
+        # Build the frame once from the concatenated partitions
+        model_df = pd.DataFrame(values, columns=years)
+        for i, col in enumerate(id_cols):
+            model_df.insert(i, col, pd.Categorical.from_codes(codes[:, i],
+                                                              categories=manifest['categories'][col]))
+        if (species):
+            model_df = model_df[_isin(model_df['EM_Species'], species)].reset_index(drop=True)
+        return model_df
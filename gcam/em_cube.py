@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+@author: nich980
+
+Dense (model x scenario x species x year) emissions cube built from an AR6
+DataFrame with a single groupby. Sub-species are summed into their species,
+or kept as their own (species, sub-species) entries on the species axis. The
+plotting functions slice the cube instead of re-filtering the DataFrame.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ar6_store import year_columns
+
+
+def _labels(values):
+    if (isinstance(values, str)):
+        return [values]
+    return list(values)
+
+
+
+class EmissionsCube:
+    """
+    Emissions summed over sub-species (or over duplicate rows) for every
+    model, scenario, & species. Cells with no rows in the DataFrame, & years
+    with no value in any row of a cell, are NaN
+    """
+
+    def __init__(self, data, counts, models, scenarios, species, years, units):
+        """
+        Constructor for the EmissionsCube class
+
+        Parameters
+        -----------
+        data : Numpy array
+            Emissions, shape (models, scenarios, species, years)
+        counts : Numpy array
+            Number of DataFrame rows with at least one value summed into each
+            cell, shape (models, scenarios, species)
+        models, scenarios, species : list
+            Labels of the first three axes. Species labels are str, or
+            (species, sub-species) tuples for a sub-species cube
+        years : list of int
+            Labels of the year axis
+        units : dict
+            Unit of each species label
+        """
+        self.data      = data
+        self.counts    = counts
+        self.models    = list(models)
+        self.scenarios = list(scenarios)
+        self.species   = list(species)
+        self.years     = list(years)
+        self.units     = dict(units)
+
+    @classmethod
+    def from_frame(cls, model_df, sub_species=False):
+        """
+        Build a cube from a DataFrame returned by get_model_df or AR6Store.load.
+        Axis labels keep the order they first appear in model_df
+
+        Parameters
+        -----------
+        model_df : Pandas DataFrame
+            AR6 data
+        sub_species : bool, optional
+            If True, each (species, sub-species) pair gets its own entry on the
+            species axis instead of being summed into its species. Rows
+            without a sub-species are dropped. Default is False
+
+        Return
+        -------
+        EmissionsCube
+        """
+        years = year_columns(model_df)
+        model_codes, models = pd.factorize(model_df['Model'], sort=False)
+        scn_codes, scenarios = pd.factorize(model_df['Scenario'], sort=False)
+        if (sub_species):
+            pairs = pd.MultiIndex.from_arrays([model_df['EM_Species'], model_df['EM_SubSpecies']])
+            keep = ~model_df['EM_SubSpecies'].isna().to_numpy()
+            sp_codes, species = pd.factorize(pairs[keep], sort=False)
+            species = list(species)
+            model_codes, scn_codes = model_codes[keep], scn_codes[keep]
+            units = model_df['Unit'].to_numpy()[keep]
+            values = model_df[years].to_numpy(dtype=float)[keep]
+        else:
+            sp_codes, species = pd.factorize(model_df['EM_Species'], sort=False)
+            species = list(species)
+            units = model_df['Unit'].to_numpy()
+            values = model_df[years].to_numpy(dtype=float)
+        # Sum the rows of every (model, scenario, species) cell in one pass.
+        # Years without a value in any row of a cell stay NaN
+        codes = [model_codes, scn_codes, sp_codes]
+        sums  = pd.DataFrame(values).groupby(codes, sort=False).sum(min_count=1)
+        sizes = pd.Series(~np.isnan(values).all(axis=1)).groupby(codes, sort=False).sum()
+        cell_idx = tuple(sums.index.get_level_values(i).to_numpy() for i in range(3))
+        shape = (len(models), len(scenarios), len(species))
+        data = np.full(shape + (len(years),), np.nan)
+        data[cell_idx] = sums.to_numpy()
+        counts = np.zeros(shape, dtype=int)
+        counts[cell_idx] = sizes.reindex(sums.index).to_numpy(dtype=int)
+        # Unit of the first row of each species
+        _, first_row = np.unique(sp_codes, return_index=True)
+        units = {species[code]: units[row] for code, row in enumerate(first_row)}
+        return cls(data, counts, models, scenarios, species, years, units)
+
+    def select(self, model=None, scenario=None, species=None):
+        """
+        Get a sub-cube. Each argument is a label or list of labels, in the
+        order they should appear in the sub-cube. None keeps the whole axis
+
+        Return
+        -------
+        EmissionsCube
+        """
+        axes = [(self.models, model), (self.scenarios, scenario), (self.species, species)]
+        idx = []
+        labels = []
+        for axis_labels, selected in axes:
+            if (selected is None):
+                idx.append(np.arange(len(axis_labels)))
+                labels.append(axis_labels)
+            else:
+                selected = [selected] if isinstance(selected, (str, tuple)) else list(selected)
+                idx.append(np.array([axis_labels.index(label) for label in selected], dtype=int))
+                labels.append(selected)
+        grid = np.ix_(*idx)
+        units = {label: self.units[label] for label in labels[2]}
+        return EmissionsCube(self.data[grid], self.counts[grid], labels[0], labels[1],
+                             labels[2], self.years, units)
+
+    def sub_species_of(self, species):
+        """
+        Get the sub-species of one species from a sub-species cube. The
+        species axis of the returned cube is labelled by sub-species name
+
+        Return
+        -------
+        EmissionsCube
+        """
+        pairs = [label for label in self.species if label[0] == species]
+        sub_cube = self.select(species=pairs)
+        sub_cube.species = [label[1] for label in pairs]
+        sub_cube.units = {label[1]: self.units[label] for label in pairs}
+        return sub_cube
+
+    def present(self, model=None, scenario=None):
+        """
+        Get the species with data for a model and/or scenario, in axis order
+
+        Return
+        -------
+        list
+        """
+        counts = self.counts
+        if (model is not None):
+            counts = counts[[self.models.index(model)]]
+        if (scenario is not None):
+            counts = counts[:, [self.scenarios.index(scenario)]]
+        has_data = counts.sum(axis=(0, 1)) > 0
+        return [label for label, keep in zip(self.species, has_data) if keep]
+
+    def series(self, model, scenario, species):
+        """
+        Get the emissions time series of one cell
+
+        Return
+        -------
+        Numpy array
+        """
+        return self.data[self.models.index(model), self.scenarios.index(scenario),
+                         self.species.index(species)]
+
+    def cache_key(self):
+        return (self.models, self.scenarios, self.species, self.years, self.units,
+                self.data, self.counts)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+@author: nich980
+
+Cross-model percentile envelopes of AR6 emission trajectories. Percentiles
+are computed over every (model, scenario) member of an EmissionsCube at once,
+for every species & year, ignoring members with no data. Members can be
+limited to scenario categories, Ex: the AR6 C1-C8 climate categories.
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+
+from collections import namedtuple
+
+
+# Percentile bands of an envelope. values has shape (percentiles, species, years);
+# n_members is the number of members with data for each species & year
+Envelope = namedtuple('Envelope', ['percentiles', 'species', 'years', 'values', 'n_members'])
+
+
+def read_categories(f_path, col='Category'):
+    """
+    Read the scenario category of each (model, scenario) pair from a CSV
+    file, Ex: the AR6 scenario metadata
+
+    Parameters
+    -----------
+    f_path : str
+        Path of the CSV file. Must have 'Model', 'Scenario', & col columns
+    col : str, optional
+        Name of the category column. Default is 'Category'
+
+    Return
+    -------
+    dict of {(str, str): str}
+    """
+    meta_df = pd.read_csv(f_path, sep=',', header=0, usecols=['Model', 'Scenario', col])
+    return dict(zip(zip(meta_df['Model'], meta_df['Scenario']), meta_df[col]))
+
+
+
+def member_mask(cube, categories=None, keep=None, exclude_models=None):
+    """
+    Get a boolean (model, scenario) mask of the cube members to include in an
+    envelope
+
+    Parameters
+    -----------
+    cube : EmissionsCube
+        Emissions cube
+    categories : dict, optional
+        Category of each member, keyed by (model, scenario) or by scenario
+    keep : str or list of str, optional
+        Only include members whose category is in keep. Members without a
+        category are left out. Ignored if categories is None
+    exclude_models : str or list of str, optional
+        Models to leave out, Ex: the model being compared to the envelope
+
+    Return
+    -------
+    Numpy array of bool
+    """
+    mask = np.ones((len(cube.models), len(cube.scenarios)), dtype=bool)
+    if (categories is not None and keep is not None):
+        keep = [keep] if isinstance(keep, str) else keep
+        for model_idx, model in enumerate(cube.models):
+            for scn_idx, scenario in enumerate(cube.scenarios):
+                category = categories.get((model, scenario), categories.get(scenario))
+                mask[model_idx, scn_idx] = (category in keep)
+    if (exclude_models is not None):
+        exclude_models = [exclude_models] if isinstance(exclude_models, str) else exclude_models
+        mask[[model in exclude_models for model in cube.models]] = False
+    return mask
+
+
+
+def compute_envelopes(cube, percentiles=(5, 25, 50, 75, 95), categories=None, keep=None,
+                      exclude_models=None):
+    """
+    Compute percentile envelopes across the models & scenarios of a cube
+
+    Parameters
+    -----------
+    cube : EmissionsCube
+        Emissions cube, Ex: EmissionsCube.from_frame(all_df)
+    percentiles : tuple of float, optional
+        Percentiles to compute. Default is (5, 25, 50, 75, 95)
+    categories, keep, exclude_models : optional
+        Member filters, see member_mask
+
+    Return
+    -------
+    Envelope
+        Species & years with no members are NaN
+    """
+    mask = member_mask(cube, categories=categories, keep=keep, exclude_models=exclude_models)
+    # (members, species, years). Cells without data & missing years are NaN,
+    # so they are not counted in n_members or the percentiles
+    members = np.where(cube.counts[mask][:, :, None] > 0, cube.data[mask], np.nan)
+    n_members = np.sum(~np.isnan(members), axis=0)
+    if (len(members)):
+        with warnings.catch_warnings():
+            # All-NaN species & years are expected & left as NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            values = np.nanpercentile(members, percentiles, axis=0)
+    else:
+        values = np.full((len(percentiles), len(cube.species), len(cube.years)), np.nan)
+    return Envelope(tuple(percentiles), list(cube.species), list(cube.years), values, n_members)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+@author: nich980
+
+Harmonize model emission trajectories to historical emissions, Ex: CEDS, at
+a base year. Every row of a get_model_df frame (or its long form from
+melt_df) is harmonized at once: the ratio method scales a trajectory & the
+offset method shifts it, so that it matches history in the base year, and the
+adjustment fades out linearly so that the trajectory converges back to the
+raw model values by the convergence year.
+
+Example usage
+--------------
+python harmonize.py new_gcam_runs.csv ceds_history.csv -b 2015 -c 2080 -o gcam_harmonized.csv
+"""
+
+import argparse
+import warnings
+import numpy as np
+
+from os import replace
+
+from ar6_store import get_model_df, year_columns
+
+
+# Columns used to match model rows to history, when present in both frames
+hist_keys = ['Region', 'EM_Species', 'EM_SubSpecies']
+
+
+def convergence_weights(years, base_year, converge_year):
+    """
+    Get the fraction of the base-year adjustment applied in each year: 1 up
+    to the base year, falling linearly to 0 at the convergence year
+
+    Return
+    -------
+    Numpy array
+    """
+    years = np.asarray(years, dtype=float)
+    return np.clip((converge_year - years) / float(converge_year - base_year), 0.0, 1.0)
+
+
+
+def _base_values(df, base_year, value_col):
+    """
+    Get the base-year values of a wide or long frame, with their identifier
+    columns
+    """
+    if ('Year' in df.columns):
+        base_df = df.loc[df['Year'] == base_year].drop('Year', axis=1)
+        return base_df.rename(columns={value_col: 'base'})
+    if (base_year not in df.columns):
+        raise ValueError('Base year {} is not in the frame'.format(base_year))
+    id_cols = [col for col in df.columns if col not in year_columns(df)]
+    return df[id_cols].assign(base=df[base_year].to_numpy())
+
+
+
+def _lookup(left, right, keys, col):
+    """
+    Get right[col] for every row of left, matched on keys, in left's order.
+    Rows without a match are NaN
+    """
+    left_keys = left[keys].astype(object)
+    right_vals = right[keys].astype(object).assign(**{col: right[col].to_numpy()})
+    right_vals = right_vals.drop_duplicates(keys)
+    return left_keys.merge(right_vals, how='left', on=keys)[col].to_numpy()
+
+
+
+def harmonize(model_df, hist_df, base_year, converge_year, method='ratio', keys=None,
+              value_col='EM_Value'):
+    """
+    Harmonize every trajectory of a model frame to history
+
+    Parameters
+    -----------
+    model_df : Pandas DataFrame
+        Model trajectories. Either the wide frame returned by get_model_df,
+        or its long form returned by melt_df ('Year' & value_col columns)
+    hist_df : Pandas DataFrame
+        Historical emissions, wide or long, with a value for base_year.
+        Ex: get_model_df of a CEDS file in the same format
+    base_year : int
+        Year in which the trajectories match history
+    converge_year : int
+        Year by which the trajectories are back to the raw model values
+    method : str, optional
+        'ratio' (default) scales each trajectory by history / model in the
+        base year. 'offset' adds history - model in the base year. Rows whose
+        base-year model value is 0 use 'offset'
+    keys : list of str, optional
+        Columns that match model rows to history rows. Default is the
+        columns of hist_keys found in hist_df
+    value_col : str, optional
+        Value column of long frames. Default is 'EM_Value'
+
+    Return
+    -------
+    Pandas DataFrame
+        Same layout as model_df. Rows without history or without a
+        base-year model value are left unchanged
+    """
+    if (method not in ['ratio', 'offset']):
+        raise ValueError("Invalid harmonization method '{}'".format(method))
+    if (converge_year <= base_year):
+        raise ValueError('converge_year must be after base_year')
+    if (keys is None):
+        keys = [col for col in hist_keys if col in hist_df.columns]
+    hist_base = _base_values(hist_df, base_year, value_col)
+    model_base = _base_values(model_df, base_year, value_col)
+    id_cols = [col for col in model_base.columns if col != 'base']
+    long = ('Year' in model_df.columns)
+
+    # Base-year model & history value of every row of model_df
+    if (long):
+        row_ids = model_df[id_cols]
+        m_0 = _lookup(row_ids, model_base, id_cols, 'base')
+        h_0 = _lookup(row_ids, hist_base, keys, 'base')
+        values = model_df[value_col].to_numpy(dtype=float)
+        weights = convergence_weights(model_df['Year'].to_numpy(), base_year, converge_year)
+    else:
+        m_0 = model_base['base'].to_numpy(dtype=float)
+        h_0 = _lookup(model_base, hist_base, keys, 'base')
+        years = year_columns(model_df)
+        values = model_df[years].to_numpy(dtype=float)
+        weights = convergence_weights(years, base_year, converge_year)[None, :]
+        m_0, h_0 = m_0[:, None], h_0[:, None]
+
+    # Rows without a base-year history or model value cannot be harmonized
+    skip = np.isnan(h_0) | np.isnan(m_0)
+    if (skip.any()):
+        if (long):
+            n_rows = int(np.sum(skip & (model_df['Year'] == base_year).to_numpy()))
+        else:
+            n_rows = int(skip.sum())
+        warnings.warn('{} rows have no history or no model value in {} & are not '
+                      'harmonized'.format(n_rows, base_year))
+    use_offset = (method == 'offset') | (m_0 == 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(use_offset, 1.0, h_0 / m_0)
+    offset = np.where(use_offset, h_0 - m_0, 0.0)
+    harmonized = values * (1.0 + (ratio - 1.0) * weights) + offset * weights
+    harmonized = np.where(skip, values, harmonized)
+
+    out_df = model_df.copy()
+    if (long):
+        out_df[value_col] = harmonized
+    else:
+        out_df[years] = harmonized
+    return out_df
+
+
+
+def to_ar6_csv(model_df, f_path):
+    """
+    Write a get_model_df frame back to the AR6 CSV layout, so that it can be
+    read with get_model_df or AR6Store & plotted. The file is written to
+    '<f_path>.tmp' & then moved into place
+
+    Parameters
+    -----------
+    model_df : Pandas DataFrame
+        Wide frame in the get_model_df layout
+    f_path : str
+        Path of the CSV file
+    """
+    years = year_columns(model_df)
+    species = model_df['EM_Species'].astype(str)
+    sub_species = model_df['EM_SubSpecies'].astype(str)
+    variables = np.where(species == sub_species, 'Emissions|' + species,
+                         'Emissions|' + species + '|' + sub_species)
+    id_cols = [col for col in model_df.columns if col not in years]
+    var_idx = id_cols.index('EM_Species')
+    out_df = model_df.drop(['EM_Species', 'EM_SubSpecies'], axis=1)
+    out_df.insert(var_idx, 'Variable', variables)
+    with open(f_path + '.tmp', 'w', newline='') as f_out:
+        out_df.to_csv(f_out, sep=',', index=False)
+    replace(f_path + '.tmp', f_path)
+
+
+
+def main():
+    parse_desc = """Harmonize model emission trajectories to historical emissions"""
+    parser = argparse.ArgumentParser(description=parse_desc)
+    parser.add_argument('model_path', action='store',
+                        help='CSV file of model trajectories, in the AR6 layout')
+    parser.add_argument('hist_path', action='store',
+                        help='CSV file of historical emissions, in the AR6 layout')
+    parser.add_argument('-b', '--base-year', dest='base_year', type=int, default=2015,
+                        action='store', help='Harmonization year. Default is 2015')
+    parser.add_argument('-c', '--converge-year', dest='converge_year', type=int, default=2080,
+                        action='store', help='Year of convergence to the raw trajectories. '
+                                             'Default is 2080')
+    parser.add_argument('--method', dest='method', default='ratio', choices=['ratio', 'offset'],
+                        action='store', help='Harmonization method. Default is ratio')
+    parser.add_argument('-m', '--model', dest='model', nargs='+', default='all', action='store',
+                        help='Models to harmonize. Default is all')
+    parser.add_argument('-o', '--out', dest='out_path', required=True, action='store',
+                        help='CSV file to write the harmonized trajectories to')
+    args = parser.parse_args()
+
+    model_df = get_model_df(args.model_path, model=args.model)
+    hist_df = get_model_df(args.hist_path)
+    harmonized = harmonize(model_df, hist_df, args.base_year, args.converge_year,
+                           method=args.method)
+    to_ar6_csv(harmonized, args.out_path)
+    print('Wrote {} harmonized rows to {}'.format(len(harmonized), args.out_path))
+
+
+
+if __name__ == '__main__':
+    main()
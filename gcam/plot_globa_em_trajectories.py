@@ -5,70 +5,21 @@ Created on Thu Dec 12 08:19:44 2019
 @author: nich980
 """
 
+import argparse
+import time
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import numpy as np
 
-from os.path import join
-
-
-
-def get_model_df(abs_path, model='all'):
-    """
-    Read global AR6 dataset into a Pandas DataFrame
-    
-    Parameters
-    -----------
-    abs_path : str
-        Absolute path of the data file to read
-    model : str, optional
-        Model data to return. Ex: if model = 'GCAM', only GCAM model
-        data will be returned in the DataFrame. Default is 'all'.
-        
-    Return
-    -------
-    model_df : Pandas DataFrame
-    """
-    em_species = []
-    em_subspecies = []
-    
-    model_df = pd.read_csv(abs_path, sep=',', header=0)
-    
-    # Remove "Emissions|" substring from every string in the Variable column
-    model_df['Variable'] = model_df['Variable'].map(lambda x: x.replace("Emissions|", ""))
-    
-    if (model != 'all'):
-        # Filter out unwanted models
-        model_df = model_df[model_df['Model'] == model]
-        
-        # Reset the index column to accurately represent each row's index
-        model_df = model_df.reset_index(drop=True)
-    
-    # Create lists for two new emission species columns
-    for x in model_df['Variable'].tolist():
-        species_split = x.split('|')
-        em_species.append(species_split[0])
-        try:
-            em_subspecies.append(species_split[1])
-        except IndexError:
-            em_subspecies.append(species_split[0])
-            
-    # Create new DataFrame columns
-    model_df['EM_Species'] = pd.Series(em_species).values
-    model_df['EM_SubSpecies'] = pd.Series(em_subspecies).values
-    
-    # Re-order the DataFrame columns
-    cols = model_df.columns.tolist()
-    cols_new = cols[:-2]
-    cols_new.insert(4, 'EM_Species')
-    cols_new.insert(5, 'EM_SubSpecies')
-    model_df = model_df[cols_new]
-    
-    model_df = model_df.drop("Variable", axis=1)
-    
-    return model_df
+from matplotlib.collections import LineCollection
+from os import makedirs
+from os.path import join, basename
 
+from ar6_store import AR6Store, get_model_df, year_columns
+from em_cube import EmissionsCube
+from envelopes import compute_envelopes, read_categories
+from render import finish_figure, render_batch
 
 
 def get_scenarios(model_df, model=None):
@@ -92,27 +43,34 @@ def trim_axs(axs, N):
     
 
 
-def plot_model_facet(model_df, model):
+def plot_model_facet(cube, model, out_dir=None, fmt='png'):
     """
     Plot a facet of GCAM result graphs, by emission species, for all of the given
     GCAM scenarios in the data set
     
     Parameters
     -----------
-    model_df : Pandas DataFrame
-        DataFrame containing model data to plot
+    cube : EmissionsCube
+        Emissions cube containing the model's data
     model : str
-        Model whose data is represented in the model_df DataFrame
+        Model to plot
+    out_dir : str, optional
+        If given, save the figures to this directory instead of showing them
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'png'
         
     Return
     -------
-    None
+    list of str or None
+        Paths of the saved figures, if they were saved
     """
-    out_path = r"C:\Users\nich980\data\global_ar6"
-    
     plt.style.use('ggplot')
     
-    scenarios = get_scenarios(model_df)
+    scenarios = [scn for scn in cube.scenarios if cube.present(model=model, scenario=scn)]
+    
+    out_paths = []
+    
+    x = cube.years
     
     figsize = (10, 8)
     cols = 4
@@ -121,10 +79,8 @@ def plot_model_facet(model_df, model):
 #    fig, axs = plt.subplots(rows, cols, figsize=figsize, constrained_layout=True)
     
     for scenario in scenarios:
-            
-        scenario_df = model_df[model_df['Scenario'] == scenario]
         
-        em_species = scenario_df['EM_Species'].unique()
+        em_species = cube.present(model=model, scenario=scenario)
         
         figsize = (10, 8)
         cols = 4
@@ -138,18 +94,10 @@ def plot_model_facet(model_df, model):
         for ax, species in zip(axs, em_species):
             ax.set_title('species = {}'.format(species))
             
-            data_df = scenario_df[scenario_df['EM_Species'] == species]
-            units = data_df['Unit'].tolist()
-            
-            if (not isinstance(units, str)):
-                units = units[0]
-            
-            units = '{}/yr'.format(units[:2])
-            
-            x = [int(col) for col in data_df.columns.tolist() if col.isdigit()]
+            units = '{}/yr'.format(cube.units[species][:2])
             
-            # If sub-species exist, sum their values
-            y = data_df.iloc[:,7:].sum().values
+            # Sub-species are already summed in the cube
+            y = cube.series(model, scenario, species)
             
             ax.plot(x, y, color='blue', marker='o', ls='-', ms=4, label=species)
             ax.set_ylabel('{}'.format(units))
@@ -161,41 +109,149 @@ def plot_model_facet(model_df, model):
         # End species loop
         
         f_name = '{}-{}-facet.png'.format(model, scenario)
-        out_path = join(out_path, f_name)
         print(f_name)
         
-        figManager = plt.get_current_fig_manager()
-        figManager.window.showMaximized()
-        
-        plt.show()
+        out_paths.append(finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt))
         
     # End scenario loop
     
+    return out_paths
+    
+    
+    
+def decimate(x, y, n_px):
+    """
+    Reduce many series to at most two points per pixel column, keeping the
+    min & max of each column so that the drawn envelope is unchanged
     
+    Parameters
+    -----------
+    x : Numpy array
+        Shared x values, ascending. Shape (n_points,)
+    y : Numpy array
+        Series values. Shape (n_series, n_points)
+    n_px : int
+        Width of the plot area in pixels
+        
+    Return
+    -------
+    tuple of (Numpy array, Numpy array)
+        Decimated x & y. Returned unchanged if there are fewer points than
+        pixel columns
+    """
+    if (len(x) <= n_px):
+        return (x, y)
+    # Index of the first point in each occupied pixel column
+    bins = np.floor((x - x[0]) / (x[-1] - x[0]) * (n_px - 1)).astype(int)
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    y_min = np.fmin.reduceat(y, starts, axis=1)
+    y_max = np.fmax.reduceat(y, starts, axis=1)
+    x_bin = x[starts]
+    x_out = np.repeat(x_bin, 2)
+    y_out = np.empty((y.shape[0], 2 * len(starts)), dtype=y.dtype)
+    y_out[:, 0::2] = y_min
+    y_out[:, 1::2] = y_max
+    return (x_out, y_out)
+
+
+def plot_overlay(ax, x, y, color=(0.5, 0.5, 0.5), marker='o', ms=4, zorder=1):
+    """
+    Draw many background series sharing the same x values as a single
+    LineCollection, plus a single marker-only Line2D, instead of one Line2D
+    per series
     
-def plot_all_facet(model_df):
+    Parameters
+    -----------
+    ax : Matplotlib Axes
+    x : Numpy array
+        Shared x values. Shape (n_points,)
+    y : Numpy array
+        Series values. Shape (n_series, n_points)
+    color : color, optional
+    marker : str, optional
+        Marker drawn at every point. None to draw lines only
+    ms : float, optional
+        Marker size
+    zorder : float, optional
+    """
+    y = np.asarray(y, dtype=float)
+    if (y.size == 0):
+        return
+    n_px = int(np.ceil(ax.get_window_extent().width))
+    x, y = decimate(np.asarray(x, dtype=float), y, max(n_px, 1))
+    segs = np.empty(y.shape + (2,))
+    segs[..., 0] = x
+    segs[..., 1] = y
+    ax.add_collection(LineCollection(segs, colors=[color], linestyles='-',
+                                     zorder=zorder))
+    if (marker):
+        # Markers of every series share one artist
+        ax.plot(np.tile(x, y.shape[0]), y.ravel(), color=color, marker=marker,
+                ls='none', ms=ms, zorder=zorder)
+    ax.autoscale_view()
+
+
+def plot_bands(ax, x, values, color=(0.5, 0.5, 0.5), zorder=1):
+    """
+    Draw percentile bands as nested shaded regions. Percentiles are paired
+    from the outside in (Ex: 5-95, 25-75), and a middle percentile, if any,
+    is drawn as a line
+    
+    Parameters
+    -----------
+    ax : Matplotlib Axes
+    x : Numpy array
+        Shared x values. Shape (n_points,)
+    values : Numpy array
+        Percentile values in increasing percentile order. Shape
+        (n_percentiles, n_points)
+    color : color, optional
+    zorder : float, optional
+    """
+    n_pairs = len(values) // 2
+    for pair_idx in range(n_pairs):
+        ax.fill_between(x, values[pair_idx], values[-1 - pair_idx], color=color,
+                        alpha=0.25 + 0.5 * pair_idx / max(n_pairs, 1), lw=0,
+                        zorder=zorder)
+    if (len(values) % 2):
+        ax.plot(x, values[n_pairs], color=color, ls='--', lw=1, zorder=zorder)
+
+
+def plot_all_facet(cube, out_dir=None, fmt='png', bulk=True, envelope=None):
     """
     Plot a facet of all model result graphs, by emission species, for all of the given
     scenarios in the data set
     
     Parameters
     -----------
-    model_df : Pandas DataFrame
-        DataFrame containing model data to plot
-    model : str
-        Model whose data is represented in the model_df DataFrame
+    cube : EmissionsCube
+        Emissions cube containing data for all models
+    out_dir : str, optional
+        If given, save the figures to this directory instead of showing them
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'png'
+    bulk : bool, optional
+        If True (default), draw the non-GCAM models of each panel with
+        plot_overlay. If False, draw one Line2D per model row
+    envelope : Envelope, optional
+        Percentile envelopes from envelopes.compute_envelopes. If given, the
+        non-GCAM models are drawn as percentile bands instead of lines
         
     Return
     -------
-    None
+    list of str or None
+        Paths of the saved figures, if they were saved
     """
-    out_path = r"C:\Users\nich980\data\global_ar6"
-    
     plt.style.use('ggplot')
     
-    scenarios = get_scenarios(model_df, model='GCAM')
+    scenarios = [scn for scn in cube.scenarios if cube.present(model='GCAM', scenario=scn)]
+    
+    out_paths = []
     
-    models = model_df['Model'].unique()
+    models = cube.models
+    is_gcam = np.array([model == 'GCAM' for model in models])
+    
+    x = cube.years
     
     figsize = (10, 8)
     cols = 4
@@ -205,9 +261,9 @@ def plot_all_facet(model_df):
     
     for scenario in scenarios:
         
-        scenario_df = model_df[model_df['Scenario'] == scenario]
+        scn_idx = cube.scenarios.index(scenario)
         
-        em_species = scenario_df['EM_Species'].unique()
+        em_species = cube.present(scenario=scenario)
         
         figsize = (10, 8)
         cols = 4
@@ -221,29 +277,38 @@ def plot_all_facet(model_df):
         for ax, species in zip(axs, em_species):
             ax.set_title('species = {}'.format(species))
             
-            data_df = scenario_df[scenario_df['EM_Species'] == species]
-            units = data_df['Unit'].tolist()
-            
-            if (not isinstance(units, str)):
-                units = units[0]
+            units = '{}/yr'.format(cube.units[species][:2])
             
-            units = '{}/yr'.format(units[:2])
+            sp_idx = cube.species.index(species)
+            model_sums = cube.data[:, scn_idx, sp_idx]
+            n_rows = cube.counts[:, scn_idx, sp_idx]
             
-            for model in models:
-                
-                if (model == 'GCAM'):
-                    plt_color = 'blue'
-                    z = 2
-                else:
-                    plt_color = (0.5, 0.5, 0.5)
-                    z = 1
+            if (envelope is not None):
+                # Percentile bands of the other models; GCAM keeps its own artist
+                if (species in envelope.species):
+                    plot_bands(ax, x, envelope.values[:, envelope.species.index(species)])
+                for y in model_sums[(n_rows > 0) & is_gcam]:
+                    ax.plot(x, y, color='blue', marker='o', ls='-', ms=4, zorder=2)
+            elif (bulk):
+                # One summed series per model; GCAM keeps its own artist
+                has_data = (n_rows > 0)
+                plot_overlay(ax, x, model_sums[has_data & ~is_gcam], ms=4, zorder=1)
+                for y in model_sums[has_data & is_gcam]:
+                    ax.plot(x, y, color='blue', marker='o', ls='-', ms=4, zorder=2)
+            else:
+                for model_idx, model in enumerate(models):
                     
-                temp_df = data_df[data_df['Model'] == model]
-                
-                for i in range(len(temp_df.index)):
-                    x = [int(col) for col in temp_df.columns.tolist() if col.isdigit()]
-                    y = temp_df.iloc[:,7:].sum().values
-                    ax.plot(x, y, color=plt_color, marker='o', ls='-', ms=4, zorder=z)
+                    if (model == 'GCAM'):
+                        plt_color = 'blue'
+                        z = 2
+                    else:
+                        plt_color = (0.5, 0.5, 0.5)
+                        z = 1
+                    
+                    # The per-row plot draws the model's sum once per row
+                    for i in range(n_rows[model_idx]):
+                        y = model_sums[model_idx]
+                        ax.plot(x, y, color=plt_color, marker='o', ls='-', ms=4, zorder=z)
                     
             ax.set_ylabel('{}'.format(units))
             ax.set_xticks([2025, 2050, 2075, 2100])
@@ -251,40 +316,99 @@ def plot_all_facet(model_df):
         
         # End species loop
         f_name = '{}-{}-facet.png'.format('ALL', scenario)
-        out_path = join(out_path, f_name)
         print(f_name)
         
-        figManager = plt.get_current_fig_manager()
-        figManager.window.showMaximized()
-        
-        plt.show()
+        out_paths.append(finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt))
         
     # End scenario loop
+    
+    return out_paths
      
 
 
 
-def plot_gcam_scanarios(model_df, model='GCAM'):
+def benchmark_all_facet(cube, out_dir, scenario=None):
+    """
+    Render plot_all_facet with & without the bulk overlay and compare render
+    time & the rendered images
+    
+    Parameters
+    -----------
+    cube : EmissionsCube
+        Emissions cube containing data for all models
+    out_dir : str
+        Directory to render the figures to. Each path renders to its own
+        subdirectory, 'legacy' & 'bulk'
+    scenario : str, optional
+        Only render this scenario. Default is every GCAM scenario
+        
+    Return
+    -------
+    Pandas DataFrame
+        Render time of each path, & the max & mean absolute pixel difference
+        between the two images, for each figure
+    """
+    if (scenario):
+        cube = cube.select(scenario=scenario)
+    plt.switch_backend('Agg')
+    times = {}
+    paths = {}
+    for mode in ['legacy', 'bulk']:
+        mode_dir = join(out_dir, mode)
+        makedirs(mode_dir, exist_ok=True)
+        t_start = time.perf_counter()
+        paths[mode] = plot_all_facet(cube, out_dir=mode_dir, fmt='png',
+                                     bulk=(mode == 'bulk'))
+        times[mode] = time.perf_counter() - t_start
+    rows = []
+    for legacy_path, bulk_path in zip(paths['legacy'], paths['bulk']):
+        img_diff = np.abs(plt.imread(legacy_path) - plt.imread(bulk_path))
+        rows.append({'figure': basename(bulk_path), 'max_pixel_diff': img_diff.max(),
+                     'mean_pixel_diff': img_diff.mean()})
+    table = pd.DataFrame(rows)
+    print('plot_all_facet: legacy {:.2f} s, bulk {:.2f} s ({:.1f}x)'.format(
+          times['legacy'], times['bulk'], times['legacy'] / times['bulk']))
+    print(table)
+    return table
+
+
+
+def plot_gcam_scanarios(cube, model='GCAM', out_dir=None, fmt='png'):
     """
     Plot all GCAM scenarios for each species (except HFC & PFC) on a facet plot
-    """       
-    out_path = r"C:\Users\nich980\data\global_ar6"
     
+    Parameters
+    -----------
+    cube : EmissionsCube
+        Emissions cube containing the model's data
+    model : str, optional
+        Model to plot. Default is 'GCAM'
+    out_dir : str, optional
+        If given, save the figures to this directory instead of showing them
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'png'
+        
+    Return
+    -------
+    str or None
+        Path of the saved figure, if it was saved
+    """
     plt.style.use('ggplot')
     
-    scenarios = get_scenarios(model_df)
+    scenarios = [scn for scn in cube.scenarios if cube.present(model=model, scenario=scn)]
     
     colors = cm.tab20(np.linspace(0, 1, len(scenarios)))
     
+    x = cube.years
+    
     figsize = (10, 8)
     cols = 4
     rows = 4
     
 #    fig, axs = plt.subplots(rows, cols, figsize=figsize, constrained_layout=True)
         
-    em_species = model_df['EM_Species'].unique().tolist()
-    em_species.remove('HFC')
-    em_species.remove('PFC')
+    em_species = [species for species in cube.present(model=model)
+                  if species not in ['HFC', 'PFC']]
     
     
     figsize = (10, 8)
@@ -298,23 +422,14 @@ def plot_gcam_scanarios(model_df, model='GCAM'):
     
     for ax, species in zip(axs, em_species):
         
-        data_df = model_df[model_df['EM_Species'] == species]
-            
-        units = data_df['Unit'].tolist()
-        if (not isinstance(units, str)):
-                units = units[0]
-            
-        units = '{}/yr'.format(units[:2])
+        units = '{}/yr'.format(cube.units[species][:2])
         
         ax.set_title('species = {}'.format(species))
         
         for scenario_idx, scenario in enumerate(scenarios):
-            scenario_df = data_df[data_df['Scenario'] == scenario]
-
-            x = [int(col) for col in scenario_df.columns.tolist() if col.isdigit()]
             
-            # If sub-species exist, sum their values
-            y = scenario_df.iloc[:,7:].sum().values
+            # Sub-species are already summed in the cube
+            y = cube.series(model, scenario, species)
             
             ax.plot(x, y, c=colors[scenario_idx], ls='-', lw=1, label=scenario)
             
@@ -332,37 +447,50 @@ def plot_gcam_scanarios(model_df, model='GCAM'):
     for legobj in leg.legendHandles:
         legobj.set_linewidth(3.0)
     
-    f_name = '{}-{}-facet.png'.format(model, scenario)
-    out_path = join(out_path, f_name)
+    f_name = '{}-scenarios-facet.png'.format(model)
     print(f_name)
     
-    figManager = plt.get_current_fig_manager()
-    figManager.window.showMaximized()
-    
-    plt.show()
+    return finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt)
     
     
     
-def plot_fluorocarbons(model_df, model='GCAM'):
-    out_path = r"C:\Users\nich980\data\global_ar6"
+def plot_fluorocarbons(sub_cube, model='GCAM', species='HFC', out_dir=None, fmt='png'):
+    """
+    Plot all GCAM scenarios for each sub-species of a fluorocarbon species on a
+    facet plot
     
+    Parameters
+    -----------
+    sub_cube : EmissionsCube
+        Sub-species emissions cube containing the model's data, Ex: from
+        EmissionsCube.from_frame(model_df, sub_species=True)
+    model : str, optional
+        Model to plot. Default is 'GCAM'
+    species : str, optional
+        'HFC' or 'PFC'. Default is 'HFC'
+    out_dir : str, optional
+        If given, save the figures to this directory instead of showing them
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'png'
+        
+    Return
+    -------
+    str or None
+        Path of the saved figure, if it was saved
+    """
     plt.style.use('ggplot')
     
-    scenarios = get_scenarios(model_df)
+    scenarios = [scn for scn in sub_cube.scenarios if sub_cube.present(model=model, scenario=scn)]
     
     colors = cm.tab20(np.linspace(0, 1, len(scenarios)))
     
+    x = sub_cube.years
+    
     figsize = (10, 8)
     cols = 4
     rows = 4
     
 #    fig, axs = plt.subplots(rows, cols, figsize=figsize, constrained_layout=True)
-        
-    hfc = model_df[model_df['EM_Species'] == 'HFC']
-    pfc = model_df[model_df['EM_Species'] == 'PFC']
-    
-    species_dict = {'HFC': hfc,
-                    'PFC': pfc}
     
     plot_dims = {'HFC': (3, 3),
                  'PFC': (2, 2)}
@@ -372,7 +500,7 @@ def plot_fluorocarbons(model_df, model='GCAM'):
     
     figsize = (10, 8)
     
-    for species in ['HFC']:
+    for species in [species]:
         
         cols = plot_dims[species][0]
         rows = plot_dims[species][1]
@@ -380,12 +508,12 @@ def plot_fluorocarbons(model_df, model='GCAM'):
         fig, axs = plt.subplots(rows, cols, figsize=figsize, dpi=150, constrained_layout=True)
         fig.suptitle('{} Scenarios for {} Sub-species'.format(model, species), fontsize=16)
         
-        # HFC or PFC DataFrame
-        species_df = species_dict[species]
+        # HFC or PFC sub-species of the model
+        species_cube = sub_cube.select(model=model).sub_species_of(species)
         
-        sub_species = species_df['EM_SubSpecies'].unique().tolist()
+        sub_species = species_cube.species
         
-        units = species_df['Unit'].tolist()[0]
+        units = species_cube.units[sub_species[0]]
         
 #        if (not isinstance(units, str)):
 #            units = units[0]
@@ -396,8 +524,6 @@ def plot_fluorocarbons(model_df, model='GCAM'):
         
         for ax, sub_s in zip(axs, sub_species):
             
-            # Sub-species DataFrame
-            subs_df = species_df[species_df['EM_SubSpecies'] == sub_s]
 #                
 #            units = data_df['Unit'].tolist()
 #            if (not isinstance(units, str)):
@@ -408,12 +534,8 @@ def plot_fluorocarbons(model_df, model='GCAM'):
             ax.set_title('{}'.format(sub_s))
             
             for scenario_idx, scenario in enumerate(scenarios):
-                scenario_df = subs_df[subs_df['Scenario'] == scenario]
-    
-                x = [int(col) for col in scenario_df.columns.tolist() if col.isdigit()]
                 
-                # If sub-species exist, sum their values
-                y = scenario_df.iloc[:,7:].sum().values
+                y = species_cube.series(model, scenario, sub_s)
                 
                 ax.plot(x, y, c=colors[scenario_idx], ls='-', lw=1.5, label=scenario)
                 
@@ -431,21 +553,87 @@ def plot_fluorocarbons(model_df, model='GCAM'):
         for legobj in leg.legendHandles:
             legobj.set_linewidth(3.0)
         
-        f_name = '{}-{}-facet.png'.format(model, scenario)
-        out_path = join(out_path, f_name)
+        f_name = '{}-{}-facet.png'.format(model, species)
         print(f_name)
         
-        figManager = plt.get_current_fig_manager()
-        figManager.window.showMaximized()
-        
-        plt.show()
-        break
+        return finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt)
     
 
 
+def render_figures(model_df, out_dir, model='GCAM', all_df=None, fmt='png',
+                   max_workers=None, use_cache=True, bands=True, categories=None,
+                   keep=None, envelope_df=None):
+    """
+    Render every facet plot headlessly, one figure per worker process
+    
+    Parameters
+    -----------
+    model_df : Pandas DataFrame
+        DataFrame containing the model's data, Ex: from get_model_df(model='GCAM')
+    out_dir : str
+        Directory to save the figures to
+    model : str, optional
+        Model whose data is represented in the model_df DataFrame
+    all_df : Pandas DataFrame, optional
+        DataFrame containing data for all models. If given, the plot_all_facet
+        figures are rendered as well, and the emissions cube of every plot is
+        built from all_df
+    fmt : str, optional
+        Output file format. Default is 'png'
+    max_workers : int, optional
+        Number of worker processes. Default is the number of CPUs
+    use_cache : bool, optional
+        If True (default), figures whose input data is unchanged since they
+        were last rendered to out_dir are not re-rendered
+    bands : bool, optional
+        If True (default), the plot_all_facet figures draw the other models
+        as percentile bands across the members of envelope_df. If False,
+        every model is drawn as a line
+    categories : dict, optional
+        Scenario category of each (model, scenario), Ex: from
+        envelopes.read_categories
+    keep : str or list of str, optional
+        Only include scenarios in these categories in the bands
+    envelope_df : Pandas DataFrame, optional
+        DataFrame the bands are computed from, Ex: the whole database from
+        AR6Store.load(). Default is all_df
+        
+    Return
+    -------
+    list of str
+        Paths of the saved figures
+    """
+    # Sum sub-species once; each job gets the slice of the cube it plots
+    cube = EmissionsCube.from_frame(model_df if all_df is None else all_df)
+    model_cube = cube.select(model=model)
+    sub_cube = EmissionsCube.from_frame(model_df, sub_species=True)
+    scenarios = [scn for scn in cube.scenarios if cube.present(model=model, scenario=scn)]
+    jobs = []
+    for scenario in scenarios:
+        jobs.append((plot_model_facet, (model_cube.select(scenario=scenario), model), {}))
+    jobs.append((plot_gcam_scanarios, (model_cube,), {'model': model}))
+    for species in ['HFC', 'PFC']:
+        jobs.append((plot_fluorocarbons, (sub_cube,), {'model': model, 'species': species}))
+    if (all_df is not None):
+        envelope = None
+        if (bands):
+            env_cube = cube if envelope_df is None else EmissionsCube.from_frame(envelope_df)
+            envelope = compute_envelopes(env_cube, categories=categories, keep=keep,
+                                         exclude_models=model)
+        for scenario in scenarios:
+            jobs.append((plot_all_facet, (cube.select(scenario=scenario),),
+                         {'envelope': envelope}))
+    out_paths = []
+    for paths in render_batch(jobs, out_dir, fmt=fmt, max_workers=max_workers,
+                              use_cache=use_cache):
+        out_paths.extend(paths if isinstance(paths, list) else [paths])
+    return out_paths
+
+
+
 def melt_df(model_df):
-    melted_df = model_df.melt(id_vars=['Model', 'Scenario', 'Region', 'EM_Species',
-                                       'EM_SubSpecies', 'Unit', 'Ms'], 
+    id_vars = [col for col in model_df.columns if col not in year_columns(model_df)]
+    melted_df = model_df.melt(id_vars=id_vars, 
                               var_name="Year", 
                               value_name="EM_Value")
     return melted_df
@@ -459,43 +647,65 @@ def pp_df(df):
 
    
     
-def main():
+def main(out_dir=None, use_cache=True, benchmark=False, bands=True, categories_path=None,
+         keep=None):
     f_path = r"C:\Users\nich980\data\global_ar6"
     f_name = "global_ar6_harmonized_emissions.csv"
     
     f_abs = join(f_path, f_name)
     
-    # Get the GCAM data in a DataFrame
-    em_df = get_model_df(f_abs, model="GCAM")
-#    plot_fluorocarbons(em_df)
-    plot_gcam_scanarios(em_df)
+    # Get the GCAM data in a DataFrame. The CSV file is only parsed when the
+    # store is first built or the file has changed
+    store = AR6Store(f_abs)
+    em_df = store.load(model="GCAM")
+    
+    if (benchmark):
+        # Compare the bulk overlay against one artist per model row
+        benchmark_all_facet(EmissionsCube.from_frame(store.load()),
+                            out_dir if out_dir else 'benchmark')
+        return
+    
+    if (out_dir):
+        # Render the whole figure set headlessly. The per-scenario overlays
+        # only need the GCAM scenarios of every model; the bands are computed
+        # across every model & scenario of the database
+        db_df = store.load()
+        all_df = db_df[db_df['Scenario'].isin(store.scenarios(model="GCAM"))]
+        categories = read_categories(categories_path) if categories_path else None
+        render_figures(em_df, out_dir, all_df=all_df, use_cache=use_cache, bands=bands,
+                       categories=categories, keep=keep,
+                       envelope_df=db_df if bands else None)
+        return
+    
+    em_cube = EmissionsCube.from_frame(em_df)
+    
+#    plot_fluorocarbons(EmissionsCube.from_frame(em_df, sub_species=True))
+    plot_gcam_scanarios(em_cube)
     
 #    print(em_df.columns.tolist())
-#    plot_model_facet(em_df, 'GCAM')
-#    plot_gcam_scanarios(em_df)
+#    plot_model_facet(em_cube, 'GCAM')
+#    plot_gcam_scanarios(em_cube)
     
 #    em_df = get_model_df(f_abs)
-#    plot_all_facet(em_df)
-    
-    
-   
-    
-    
-    
-    
-    
+#    plot_all_facet(EmissionsCube.from_frame(em_df))
     
     
     
 if __name__ == '__main__':
-    main()
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
\ No newline at end of file
+    parse_desc = """Plot AR6 harmonized emission trajectories"""
+    parser = argparse.ArgumentParser(description=parse_desc)
+    parser.add_argument('-o', '--out-dir', dest='out_dir', default=None, action='store',
+                        help='Render all figures to this directory instead of showing them')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='Re-render every figure, even if its inputs are unchanged')
+    parser.add_argument('--benchmark', dest='benchmark', action='store_true',
+                        help='Benchmark the bulk all-model overlay against the per-row plot')
+    parser.add_argument('--lines', dest='bands', action='store_false',
+                        help='Draw every other model as a line instead of percentile bands')
+    parser.add_argument('--categories', dest='categories_path', default=None, action='store',
+                        help='CSV file with the Category of each Model & Scenario')
+    parser.add_argument('--keep', dest='keep', nargs='+', default=None, action='store',
+                        help='Only include these scenario categories in the bands, Ex: C1 C2')
+    args = parser.parse_args()
+    main(out_dir=args.out_dir, use_cache=args.use_cache, benchmark=args.benchmark,
+         bands=args.bands, categories_path=args.categories_path, keep=args.keep)
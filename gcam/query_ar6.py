@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+@author: nich980
+
+Query the AR6 harmonized emissions database by model, scenario, region,
+species, sub-species, & year. Queries are answered from a sorted index of the
+category codes of every row, kept next to the AR6Store partitions & rebuilt
+with the store, so that repeated queries do not read the CSV file or the
+partitions.
+
+Example usage
+--------------
+python query_ar6.py global_ar6_harmonized_emissions.csv -m GCAM -s SSP2-45 -e Sulfur -y 2050
+"""
+
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from os import replace
+from os.path import join, exists
+
+from ar6_store import AR6Store
+
+
+# Identifier columns the index is sorted by, in order. Leading columns with a
+# filter are found by binary search; the others are masked
+index_cols = ['Model', 'Scenario', 'EM_Species', 'Region', 'EM_SubSpecies']
+
+
+class AR6Index:
+    """
+    Rows of an AR6Store sorted by the category codes of index_cols
+    """
+
+    def __init__(self, store):
+        """
+        Constructor for the AR6Index class. The index is read from
+        '<store_dir>/index.npz', & built from the store if it is missing or
+        older than the store
+
+        Parameters
+        -----------
+        store : AR6Store
+            Store to index
+        """
+        self.store = store
+        manifest = store.manifest
+        self.id_cols    = manifest['id_cols']
+        self.years      = manifest['years']
+        self.categories = manifest['categories']
+        idx_path = join(store.store_dir, 'index.npz')
+        index = None
+        if (exists(idx_path)):
+            with np.load(idx_path) as npz:
+                if (tuple(npz['key']) == manifest['key']):
+                    index = (npz['codes'], npz['values'])
+        if (index is None):
+            index = self._build(idx_path, manifest['key'])
+        self.codes, self.values = index
+
+    def _build(self, idx_path, key):
+        model_df = self.store.load()
+        codes = np.column_stack([model_df[col].cat.codes.to_numpy().astype(np.int32)
+                                 for col in self.id_cols])
+        values = model_df[self.years].to_numpy(dtype=float)
+        sort_cols = [self.id_cols.index(col) for col in index_cols]
+        # np.lexsort sorts by its last key first
+        order = np.lexsort(tuple(codes[:, col] for col in reversed(sort_cols)))
+        codes, values = codes[order], values[order]
+        with open(idx_path + '.tmp', 'wb') as f_out:
+            np.savez(f_out, key=np.array(key), codes=codes, values=values)
+        replace(idx_path + '.tmp', idx_path)
+        return (codes, values)
+
+    def _codes(self, col, labels):
+        """
+        Get the category codes of labels. Unknown labels are dropped
+        """
+        labels = [labels] if isinstance(labels, str) else list(labels)
+        codes = self.categories[col].get_indexer(labels)
+        return codes[codes >= 0]
+
+    def rows(self, **filters):
+        """
+        Get the positions of the rows matching the filters
+
+        Parameters
+        -----------
+        **filters : str or list of str
+            Labels to keep for any of the id columns, Ex: Model='GCAM'
+
+        Return
+        -------
+        Numpy array of int
+        """
+        ranges = [(0, len(self.codes))]
+        remaining = dict(filters)
+        # Binary search the leading sorted columns that have a filter
+        for col in index_cols:
+            if (col not in remaining):
+                break
+            col_codes = self.codes[:, self.id_cols.index(col)]
+            new_ranges = []
+            for start, stop in ranges:
+                for code in np.sort(self._codes(col, remaining[col])):
+                    lo = start + np.searchsorted(col_codes[start:stop], code, side='left')
+                    hi = start + np.searchsorted(col_codes[start:stop], code, side='right')
+                    if (hi > lo):
+                        new_ranges.append((lo, hi))
+            del remaining[col]
+            ranges = new_ranges
+        if (not ranges):
+            return np.zeros(0, dtype=int)
+        idx = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+        # Mask the rest
+        for col, labels in remaining.items():
+            keep = np.isin(self.codes[idx, self.id_cols.index(col)], self._codes(col, labels))
+            idx = idx[keep]
+        return idx
+
+    def query(self, model=None, scenario=None, region=None, species=None, sub_species=None,
+              years=None, total=False):
+        """
+        Get the emissions matching the filters. Filters left as None match
+        every row
+
+        Parameters
+        -----------
+        model, scenario, region, species, sub_species : str or list of str, optional
+            Labels to keep, Ex: species='Sulfur'
+        years : int or tuple of (int, int), optional
+            A single year, or the years [first, last]. Default is every year
+        total : bool, optional
+            If True, sum the sub-species of each species. Years without a
+            value for any sub-species stay NaN. Default is False
+
+        Return
+        -------
+        Pandas DataFrame
+            Same layout as get_model_df, with only the requested years
+        """
+        filters = {'Model': model, 'Scenario': scenario, 'Region': region,
+                   'EM_Species': species, 'EM_SubSpecies': sub_species}
+        idx = self.rows(**{col: labels for col, labels in filters.items() if labels is not None})
+        if (years is None):
+            year_idx = np.arange(len(self.years))
+        else:
+            first, last = (years, years) if isinstance(years, (int, np.integer)) else years
+            year_idx = np.array([i for i, year in enumerate(self.years) if first <= year <= last],
+                                dtype=int)
+        result = pd.DataFrame(self.values[np.ix_(idx, year_idx)],
+                              columns=[self.years[i] for i in year_idx])
+        for i, col in enumerate(self.id_cols):
+            result.insert(i, col, pd.Categorical.from_codes(self.codes[idx, i],
+                                                            categories=self.categories[col]))
+        if (total):
+            group_cols = [col for col in self.id_cols if col != 'EM_SubSpecies']
+            year_cols = [self.years[i] for i in year_idx]
+            result = result.groupby(group_cols, sort=False, observed=True)[year_cols].sum(min_count=1)
+            result = result.reset_index()
+        return result
+
+
+
+def query(abs_path, **kwargs):
+    """
+    Query an AR6 CSV file through its store & index. See AR6Index.query
+
+    Return
+    -------
+    Pandas DataFrame
+    """
+    return AR6Index(AR6Store(abs_path)).query(**kwargs)
+
+
+
+def main():
+    parse_desc = """Query the AR6 harmonized emissions database"""
+    parser = argparse.ArgumentParser(description=parse_desc)
+    parser.add_argument('f_path', action='store', help='Path of the AR6 CSV file')
+    parser.add_argument('-m', '--model', dest='model', nargs='+', default=None, action='store',
+                        help='Models to return')
+    parser.add_argument('-s', '--scenario', dest='scenario', nargs='+', default=None,
+                        action='store', help='Scenarios to return')
+    parser.add_argument('-r', '--region', dest='region', nargs='+', default=None,
+                        action='store', help='Regions to return')
+    parser.add_argument('-e', '--species', dest='species', nargs='+', default=None,
+                        action='store', help='Emission species to return, Ex: Sulfur CH4')
+    parser.add_argument('-u', '--sub-species', dest='sub_species', nargs='+', default=None,
+                        action='store', help='Emission sub-species to return')
+    parser.add_argument('-y', '--years', dest='years', nargs='+', type=int, default=None,
+                        action='store', help='A single year, or the first & last year')
+    parser.add_argument('-t', '--total', dest='total', action='store_true',
+                        help='Sum the sub-species of each species')
+    parser.add_argument('-c', '--csv', dest='csv', default=None, action='store',
+                        help="Write the result to this CSV file, or '-' for stdout")
+    args = parser.parse_args()
+
+    years = args.years
+    if (years is not None):
+        years = years[0] if len(years) == 1 else (years[0], years[1])
+
+    t_start = time.perf_counter()
+    index = AR6Index(AR6Store(args.f_path))
+    t_index = time.perf_counter()
+    result = index.query(model=args.model, scenario=args.scenario, region=args.region,
+                         species=args.species, sub_species=args.sub_species, years=years,
+                         total=args.total)
+    t_query = time.perf_counter()
+
+    if (args.csv):
+        result.to_csv(sys.stdout if args.csv == '-' else args.csv, sep=',', index=False)
+    else:
+        with pd.option_context('display.max_rows', None, 'display.max_columns', None,
+                               'display.width', 200):
+            print(result.to_string(index=False))
+    print('{} rows; index {:.3f} s, query {:.4f} s'.format(len(result), t_index - t_start,
+                                                           t_query - t_index), file=sys.stderr)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 2026
+
+@author: nich980
+
+Find the AR6 scenarios whose emission trajectories are closest to a query
+trajectory, Ex: a GCAM scenario or a frozen-emissions case, or to each other.
+Trajectories are taken from an EmissionsCube (sub-species summed), normalised,
+& compared with the RMS distance over their years, one block of members at a
+time so that memory use does not grow with the square of the number of
+scenarios.
+
+Example usage
+--------------
+python similarity.py global_ar6_harmonized_emissions.csv -m GCAM -s SSP2-45 -k 10
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+from ar6_store import AR6Store
+from em_cube import EmissionsCube
+
+
+def member_matrix(cube):
+    """
+    Get the trajectories of every (model, scenario) member with data
+
+    Parameters
+    -----------
+    cube : EmissionsCube
+
+    Return
+    -------
+    tuple of (list of (str, str), Numpy array)
+        Member labels & trajectories, shape (members, species, years)
+    """
+    has_data = cube.counts.sum(axis=2) > 0
+    model_idx, scn_idx = np.nonzero(has_data)
+    members = [(cube.models[i], cube.scenarios[j]) for i, j in zip(model_idx, scn_idx)]
+    return (members, cube.data[model_idx, scn_idx])
+
+
+
+def normalise(traj, method='scale', scale=None):
+    """
+    Normalise trajectories so that distances are comparable across species
+
+    Parameters
+    -----------
+    traj : Numpy array
+        Trajectories, shape (..., species, years)
+    method : str, optional
+        'scale' (default) divides each species by its standard deviation over
+        every trajectory & year, so trajectory magnitudes still count. 'shape'
+        removes each trajectory's mean & divides by its standard deviation,
+        so only the shape counts. None leaves the trajectories as they are
+    scale : Numpy array, optional
+        Per-species scale to use with method 'scale', Ex: the scale returned
+        for the database when normalising a query
+
+    Return
+    -------
+    tuple of (Numpy array, Numpy array or None)
+        Normalised trajectories & the per-species scale used by 'scale'
+    """
+    traj = np.asarray(traj, dtype=float)
+    if (method is None):
+        return (traj, None)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if (method == 'scale'):
+            if (scale is None):
+                flat = np.moveaxis(traj, -2, 0).reshape(traj.shape[-2], -1)
+                scale = np.nanstd(flat, axis=1) if flat.shape[1] else np.ones(traj.shape[-2])
+                scale[~(scale > 0)] = 1.0
+            return (traj / scale[:, None], scale)
+        if (method == 'shape'):
+            std = np.nanstd(traj, axis=-1, keepdims=True)
+            std[~(std > 0)] = 1.0
+            return ((traj - np.nanmean(traj, axis=-1, keepdims=True)) / std, None)
+    raise ValueError("Invalid normalisation method '{}'".format(method))
+
+
+
+def _rms(diff):
+    """
+    RMS over the last axis, ignoring NaN years. All-NaN rows are inf
+    """
+    n_years = np.sum(~np.isnan(diff), axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dist = np.sqrt(np.nansum(diff ** 2, axis=-1) / n_years)
+    dist[n_years == 0] = np.inf
+    return dist
+
+
+
+def _top_k(dist, k):
+    """
+    Get the positions & values of the k smallest distances along axis 0, in
+    increasing order
+    """
+    k = min(k, dist.shape[0])
+    part = np.argpartition(dist, k - 1, axis=0)[:k]
+    part_dist = np.take_along_axis(dist, part, axis=0)
+    order = np.argsort(part_dist, axis=0, kind='stable')
+    return (np.take_along_axis(part, order, axis=0), np.take_along_axis(part_dist, order, axis=0))
+
+
+
+def nearest(cube, query, k=10, method='scale', block_size=1024, exclude=None):
+    """
+    Find the k members closest to a query trajectory, for each species
+
+    Parameters
+    -----------
+    cube : EmissionsCube
+        Database to search, Ex: EmissionsCube.from_frame(store.load())
+    query : Numpy array or tuple of (str, str)
+        Query trajectories, shape (species, years) on the cube's species &
+        years, or the (model, scenario) of a cube member
+    k : int, optional
+        Number of matches per species. Default is 10
+    method : str, optional
+        Normalisation method, see normalise. Default is 'scale'
+    block_size : int, optional
+        Number of members compared at once. Default is 1024
+    exclude : list of (str, str), optional
+        Members to leave out of the matches. A member query is always left
+        out
+
+    Return
+    -------
+    Pandas DataFrame
+        Columns: 'EM_Species', 'Rank', 'Model', 'Scenario', 'Distance'
+    """
+    members, traj = member_matrix(cube)
+    exclude = set(exclude) if exclude else set()
+    if (isinstance(query, tuple)):
+        exclude.add(query)
+        query = cube.data[cube.models.index(query[0]), cube.scenarios.index(query[1])]
+    traj, scale = normalise(traj, method=method)
+    query, _ = normalise(query, method=method, scale=scale)
+    # Distance of every member to the query, one block of members at a time
+    dist = np.empty((len(members), len(cube.species)))
+    for start in range(0, len(members), block_size):
+        stop = start + block_size
+        dist[start:stop] = _rms(traj[start:stop] - query)
+    if (exclude):
+        dist[[member in exclude for member in members]] = np.inf
+    top_idx, top_dist = _top_k(dist, k)
+    rows = []
+    for sp_idx, species in enumerate(cube.species):
+        for rank, (member_idx, member_dist) in enumerate(zip(top_idx[:, sp_idx],
+                                                              top_dist[:, sp_idx])):
+            if (np.isfinite(member_dist)):
+                model, scenario = members[member_idx]
+                rows.append((species, rank + 1, model, scenario, member_dist))
+    return pd.DataFrame(rows, columns=['EM_Species', 'Rank', 'Model', 'Scenario', 'Distance'])
+
+
+
+def pairwise_nearest(cube, k=5, method='scale', block_size=1024):
+    """
+    Find the k nearest neighbours of every member, for each species. Only
+    members with a complete trajectory for a species are compared for that
+    species. Distances are computed one block of rows at a time, so memory
+    use is block_size x members per species
+
+    Parameters
+    -----------
+    cube : EmissionsCube
+    k : int, optional
+        Number of neighbours per member & species. Default is 5
+    method : str, optional
+        Normalisation method, see normalise. Default is 'scale'
+    block_size : int, optional
+        Number of rows of the distance matrix computed at once
+
+    Return
+    -------
+    Pandas DataFrame
+        Columns: 'EM_Species', 'Model', 'Scenario', 'Rank', 'Match_Model',
+        'Match_Scenario', 'Distance'
+    """
+    members, traj = member_matrix(cube)
+    traj, _ = normalise(traj, method=method)
+    frames = []
+    for sp_idx, species in enumerate(cube.species):
+        valid = np.flatnonzero(~np.isnan(traj[:, sp_idx]).any(axis=1))
+        if (len(valid) < 2):
+            continue
+        x = traj[valid, sp_idx]
+        sq_norms = np.einsum('ij,ij->i', x, x)
+        n_match = min(k, len(valid) - 1)
+        top_idx = np.empty((len(valid), n_match), dtype=int)
+        top_dist = np.empty((len(valid), n_match))
+        for start in range(0, len(valid), block_size):
+            stop = min(start + block_size, len(valid))
+            # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b
+            sq_dist = sq_norms[start:stop, None] + sq_norms[None, :] - 2 * (x[start:stop] @ x.T)
+            dist = np.sqrt(np.maximum(sq_dist, 0) / x.shape[1])
+            dist[np.arange(stop - start), np.arange(start, stop)] = np.inf
+            block_idx, block_dist = _top_k(dist.T, n_match)
+            top_idx[start:stop] = block_idx.T
+            top_dist[start:stop] = block_dist.T
+        labels = np.array(members, dtype=object)[valid]
+        frames.append(pd.DataFrame({
+            'EM_Species': species,
+            'Model': np.repeat(labels[:, 0], n_match),
+            'Scenario': np.repeat(labels[:, 1], n_match),
+            'Rank': np.tile(np.arange(1, n_match + 1), len(valid)),
+            'Match_Model': labels[top_idx.ravel(), 0],
+            'Match_Scenario': labels[top_idx.ravel(), 1],
+            'Distance': top_dist.ravel()}))
+    if (not frames):
+        return pd.DataFrame(columns=['EM_Species', 'Model', 'Scenario', 'Rank', 'Match_Model',
+                                     'Match_Scenario', 'Distance'])
+    return pd.concat(frames, ignore_index=True)
+
+
+
+def frozen_query(cube, model, scenario, year):
+    """
+    Build a frozen-emissions query: a member's emissions up to year, held
+    constant at their year value afterwards
+
+    Return
+    -------
+    Numpy array
+        Shape (species, years)
+    """
+    query = cube.data[cube.models.index(model), cube.scenarios.index(scenario)].copy()
+    year_idx = cube.years.index(year)
+    query[:, year_idx + 1:] = query[:, [year_idx]]
+    return query
+
+
+
+def main():
+    parse_desc = """Find the AR6 scenarios closest to a model scenario"""
+    parser = argparse.ArgumentParser(description=parse_desc)
+    parser.add_argument('f_path', action='store', help='Path of the AR6 CSV file')
+    parser.add_argument('-m', '--model', dest='model', default='GCAM', action='store',
+                        help='Model of the query scenario. Default is GCAM')
+    parser.add_argument('-s', '--scenario', dest='scenario', required=True, action='store',
+                        help='Query scenario')
+    parser.add_argument('-k', dest='k', type=int, default=10, action='store',
+                        help='Number of matches per species. Default is 10')
+    parser.add_argument('--frozen', dest='frozen', type=int, default=None, action='store',
+                        help='Hold the query emissions constant after this year')
+    parser.add_argument('--method', dest='method', default='scale', choices=['scale', 'shape'],
+                        action='store', help='Trajectory normalisation. Default is scale')
+    parser.add_argument('-c', '--csv', dest='csv', default=None, action='store',
+                        help='Write the matches to this CSV file')
+    args = parser.parse_args()
+
+    cube = EmissionsCube.from_frame(AR6Store(args.f_path).load())
+    query = (args.model, args.scenario)
+    if (args.frozen is not None):
+        query = frozen_query(cube, args.model, args.scenario, args.frozen)
+    # The query member itself is never a match, frozen or not
+    matches = nearest(cube, query, k=args.k, method=args.method,
+                      exclude=[(args.model, args.scenario)])
+    if (args.csv):
+        matches.to_csv(args.csv, sep=',', index=False)
+    else:
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(matches.to_string(index=False))
+
+
+
+if __name__ == '__main__':
+    main()
@@ -5,15 +5,202 @@ default emissions
 Matt Nicholson
 26 Feb 2020
 """
+import warnings
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import numpy as np
 import pandas as pd
 
+from compare_versions import HectorOutput, OutputIndex, read_output, normalise_scenario
+from render import finish_figure
+
+# Columns of the aligned comparison frame returned by align_outputs
+aligned_cols = ['scenario', 'variable', 'year', 'units', 'default', 'rcmip',
+                'diff', 'rel_diff']
+
 def subset_years(df, years):
     ret_df = df.loc[(df['year'] >= years[0]) & (df['year'] <= years[1])]
     return ret_df
 
+def to_index(output):
+    """
+    Get an OutputIndex for Hector output
+    
+    Params
+    ------
+    output : Pandas DataFrame, HectorOutput, or OutputIndex
+        Hector output
+        
+    Return
+    ------
+    OutputIndex
+    """
+    if (isinstance(output, OutputIndex)):
+        return output
+    elif (isinstance(output, HectorOutput)):
+        return output.index
+    return OutputIndex(output)
+
+def to_frame(output):
+    """
+    Get long-format Hector output as a DataFrame
+    
+    Params
+    ------
+    output : Pandas DataFrame, HectorOutput, or OutputIndex
+        Hector output
+        
+    Return
+    ------
+    Pandas DataFrame
+        Columns: variable, year, value, units, & scenario if the output has it
+    """
+    if (isinstance(output, HectorOutput)):
+        return output.output
+    elif (isinstance(output, OutputIndex)):
+        frames = []
+        for var in output.variables:
+            years, values, units = output.get(var)
+            frames.append(pd.DataFrame({'variable': var, 'year': years,
+                                        'value': values, 'units': units}))
+        return pd.concat(frames, ignore_index=True)
+    return output
+
+def scenario_key(scenario):
+    """
+    Format a scenario name so that the default & RCMIP names of a scenario
+    match. Ex: 'RCP45', 'rcp45', & 'rcp_45' --> 'rcp_45'
+    """
+    return normalise_scenario(str(scenario).lower())
+
+def _prepare(output, vars, years, scenario):
+    """
+    Select, filter, & key one side of a comparison. Helper for align_outputs
+    """
+    df = to_frame(output)
+    mask = np.ones(len(df), dtype=bool)
+    if (vars):
+        mask &= df['variable'].isin(vars).to_numpy()
+    if (years):
+        mask &= ((df['year'] >= years[0]) & (df['year'] <= years[1])).to_numpy()
+    df = df.loc[mask, [col for col in ['scenario', 'variable', 'year', 'value', 'units']
+                       if col in df.columns]]
+    if (scenario):
+        df = df.assign(scenario=scenario_key(scenario))
+    elif ('scenario' in df.columns):
+        keys = {x: scenario_key(x) for x in df['scenario'].unique()}
+        df = df.assign(scenario=df['scenario'].map(keys))
+    else:
+        raise ValueError('Output has no scenario column; a scenario must be given')
+    return df.astype({'variable': str, 'year': np.int16})
+
+def align_outputs(default_df, rcmip_df, vars=None, years=None, scenario=None):
+    """
+    Align default & RCMIP Hector output on (scenario, variable, year) in a
+    single join, and compute the difference & relative difference of every
+    shared variable
+    
+    Params
+    ------
+    default_df : Pandas DataFrame, HectorOutput, or OutputIndex
+        Hector output using default emissions
+    rcmip_df : Pandas DataFrame, HectorOutput, or OutputIndex
+        Hector output using RCMIP emissions
+    vars : list of str, optional
+        Variables to compare. Default is every variable in both outputs
+    years : tuple of (int, int), optional
+        Only compare output from the years [year_min, year_max]
+    scenario : str, optional
+        Scenario of both outputs. Required if the outputs have no scenario
+        column, and overrides the column if they do
+        
+    Return
+    ------
+    Pandas DataFrame
+        Columns: scenario, variable, year, units, default, rcmip, diff
+        (rcmip - default), & rel_diff (diff / |default|). Only years present
+        in both outputs are kept; a warning lists the years that are not
+    """
+    default_df = _prepare(default_df, vars, years, scenario)
+    rcmip_df   = _prepare(rcmip_df, vars, years, scenario)
+    keys = ['scenario', 'variable']
+    shared = pd.merge(default_df[keys].drop_duplicates(), rcmip_df[keys].drop_duplicates(),
+                      on=keys, how='inner')
+    if (vars):
+        missing = sorted(set(vars) - set(shared['variable']))
+        if (missing):
+            warnings.warn('Variables not in both outputs: {}'.format(', '.join(missing)))
+    aligned = pd.merge(default_df, rcmip_df, on=keys + ['year'], how='outer',
+                       suffixes=('_default', '_rcmip'), indicator=True)
+    aligned = pd.merge(aligned, shared, on=keys, how='inner')
+    unmatched = aligned[aligned['_merge'] != 'both']
+    for (scn, var), var_df in unmatched.groupby(keys, sort=True):
+        for side, label in [('left_only', 'RCMIP'), ('right_only', 'default')]:
+            yrs = var_df.loc[var_df['_merge'] == side, 'year']
+            if (len(yrs)):
+                warnings.warn('{} {}: {} years missing from the {} output ({}-{})'.format(
+                              scn, var, len(yrs), label, yrs.min(), yrs.max()))
+    aligned = aligned[aligned['_merge'] == 'both']
+    units_differ = aligned['units_default'].astype(str) != aligned['units_rcmip'].astype(str)
+    for var in aligned.loc[units_differ, 'variable'].unique():
+        warnings.warn('{}: default & RCMIP units differ'.format(var))
+    aligned = aligned.rename(columns={'value_default': 'default', 'value_rcmip': 'rcmip',
+                                      'units_default': 'units'})
+    aligned['diff'] = aligned['rcmip'] - aligned['default']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel_diff = aligned['diff'].to_numpy() / np.abs(aligned['default'].to_numpy())
+    aligned['rel_diff'] = np.where(aligned['default'].to_numpy() != 0, rel_diff, np.nan)
+    aligned = aligned.sort_values(['scenario', 'variable', 'year'], kind='mergesort')
+    aligned = aligned[aligned_cols].reset_index(drop=True)
+    for col in ['scenario', 'variable', 'units']:
+        aligned[col] = aligned[col].astype('category')
+    return aligned
+
+def group_variables(aligned, years=None):
+    """
+    Split an aligned comparison frame by variable
+    
+    Params
+    ------
+    aligned : Pandas DataFrame
+        Aligned comparison frame returned by align_outputs
+    years : tuple of (int, int), optional
+        Only keep the years [year_min, year_max]
+        
+    Return
+    ------
+    dict of {str: Pandas DataFrame}
+    """
+    if (years):
+        aligned = subset_years(aligned, years)
+    return {str(var): var_df for var, var_df in
+            aligned.groupby('variable', sort=False, observed=True)}
+
+def comparison_table(aligned):
+    """
+    Summarize an aligned comparison frame by scenario & variable
+    
+    Params
+    ------
+    aligned : Pandas DataFrame
+        Aligned comparison frame returned by align_outputs
+        
+    Return
+    ------
+    Pandas DataFrame
+        Columns: scenario, variable, units, n_years, max_abs_diff, rmse,
+        max_abs_rel_diff, & final_diff (diff in the last shared year)
+    """
+    df = aligned.assign(abs_diff=aligned['diff'].abs(), sq_diff=aligned['diff'] ** 2,
+                        abs_rel_diff=aligned['rel_diff'].abs())
+    grouped = df.groupby(['scenario', 'variable'], sort=True, observed=True)
+    table = grouped.agg(units=('units', 'first'), n_years=('year', 'size'),
+                        max_abs_diff=('abs_diff', 'max'), rmse=('sq_diff', 'mean'),
+                        max_abs_rel_diff=('abs_rel_diff', 'max'),
+                        final_diff=('diff', 'last'))
+    table['rmse'] = np.sqrt(table['rmse'])
+    return table.reset_index()
+
 def trim_axs(axs, N):
     """little helper to massage the axs list to have correct length..."""
     axs = axs.flat
@@ -21,22 +208,30 @@ def trim_axs(axs, N):
         ax.remove()
     return axs[:N]
 
-def plot_variables(default_df, rcmip_df, vars, years=(1750, 2100), scenario='RCP45'):
+def plot_variables(aligned, vars, years=(1750, 2100), scenario='RCP45',
+                   out_dir=None, fmt='pdf'):
     """
     Plot output from default Hector and RCMIP Hector emissions
     
     Parameters
     -----------
-    default_df : Pandas DataFrame
-        Default Hector emissions data
-    rcmip_df : Pandas DataFrame
-        RCMIP Hector emissions data
+    aligned : Pandas DataFrame
+        Default & RCMIP Hector output of one scenario, aligned by align_outputs
     vars : list of str
         Variables to plot
     years : tuple of (int, int)
         Years that define variable timeseries
     scenario : str
         Emissions scenario
+    out_dir : str, optional
+        If given, save the figure to this directory instead of showing it
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'pdf'
+        
+    Return
+    ------
+    str or None
+        Path of the saved figure, if it was saved
     """
     plt.style.use('ggplot')
     figsize = (10, 8)
@@ -45,23 +240,19 @@ def plot_variables(default_df, rcmip_df, vars, years=(1750, 2100), scenario='RCP
     fig, axs = plt.subplots(rows, cols, figsize=figsize, dpi=150, constrained_layout=True)
     fig.suptitle('Hector Output - RCMIP Emissions vs. Default Emissions', fontsize=16)
     axs = trim_axs(axs, len(vars))
-    x = np.asarray([x for x in range(years[0], years[1] + 1)])
-    default_df = subset_years(default_df, years)
-    rcmip_df   = subset_years(rcmip_df, years)
+    var_dfs = group_variables(aligned, years=years)
     for ax, var in zip(axs, vars):
         ax.set_title(var)
+        if (var not in var_dfs):
+            continue
         print('Plotting {}...'.format(var))
+        var_df = var_dfs[var]
+        x = var_df['year'].to_numpy()
         # Plot default variable value
-        var_df = default_df.loc[default_df['variable'] == var]
-        units  = var_df['units'].unique().tolist()[0]
-        y = np.asarray(var_df['value'])
-        ax.plot(x, y, c='g', ls='-', lw=1, label='Default')
-        ax.set_ylabel('{}'.format(units))
+        ax.plot(x, var_df['default'].to_numpy(), c='g', ls='-', lw=1, label='Default')
+        ax.set_ylabel('{}'.format(var_df['units'].iloc[0]))
         # Plot RCMIP variable value
-        var_df = rcmip_df.loc[rcmip_df['variable'] == var]
-        units  = var_df['units'].unique().tolist()[0]
-        y = np.asarray(var_df['value'])
-        ax.plot(x, y, c='r', ls='-', lw=1, label='RCMIP')
+        ax.plot(x, var_df['rcmip'].to_numpy(), c='r', ls='-', lw=1, label='RCMIP')
         ax.set_xticks([1750, 1850, 1950, 2050, 2150, 2250])
         ax.set_xlim(1750, 2100)
      # End vars loop
@@ -71,9 +262,7 @@ def plot_variables(default_df, rcmip_df, vars, years=(1750, 2100), scenario='RCP
     for legobj in leg.legendHandles:
         legobj.set_linewidth(3.0)
     f_name = 'emission-comparison-{}.pdf'.format(scenario)
-    figManager = plt.get_current_fig_manager()
-    figManager.window.showMaximized()
-    plt.show()
+    return finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt)
 # ------------------------------------------------------------------------------
 
 if __name__ == '__main__':
@@ -81,12 +270,12 @@ if __name__ == '__main__':
     outpath_rcmip   = r"C:\Users\nich980\data\hector\version-comparison\rcp45-default-rcmip.csv"
 
     # Read both output files and extract a list of variables in each
-    df_default = pd.read_csv(outpath_default, sep=',', header=0)
-    df_rcmip   = pd.read_csv(outpath_rcmip, sep=',', header=0)
+    df_default = read_output(outpath_default)
+    df_rcmip   = read_output(outpath_rcmip)
 
-    default_vars = df_default['variable'].unique().tolist()
-    rcmip_vars   = df_rcmip['variable'].unique().tolist()
+    # Align both outputs once; the plotting functions read the aligned frame
+    aligned = align_outputs(df_default, df_rcmip, scenario='RCP45')
 
-    vars = [x for x in rcmip_vars if x in default_vars]
+    vars = aligned['variable'].cat.categories.tolist()
 
-    plot_variables(df_default, df_rcmip, vars)
\ No newline at end of file
+    plot_variables(aligned, vars)
\ No newline at end of file
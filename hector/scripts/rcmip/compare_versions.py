@@ -5,15 +5,266 @@ Matt Nicholson
 This script contains functions to compare output from various versions of 
 PNNL-JGCRI's Hector Simple Climate Model
 """
+import argparse
 import re
+import time
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import numpy as np
 
-from os.path import join, exists
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from os.path import join, exists, basename, dirname
 from os import walk
 from sys import platform
+from render import finish_figure, render_batch
+
+# ============================== Column Schema =================================
+
+# Columns of long-format Hector output that hold a handful of repeated strings
+category_cols = ['scenario', 'variable', 'units', 'component']
+
+def normalise_scenario(scenario):
+    """
+    Re-format a Hector outputstream scenario name to match current Hector
+    versions. Names that are already formatted are returned unchanged
+    
+    Ex: 'rcp45' --> 'rcp_45'
+    """
+    if (scenario[3:4] == '_'):
+        return scenario
+    return scenario[:3] + '_' + scenario[3:]
+
+def apply_schema(df, float32=False, normalise=False):
+    """
+    Convert a long-format Hector output DataFrame to compact column types:
+    category dtypes for repeated strings, int16 years, & optionally float32
+    values. The DataFrame is modified in place
+    
+    Params
+    ------
+    df : Pandas DataFrame
+        Long-format Hector output
+    float32 : bool, optional
+        If True, store the 'value' column as float32. Default is False
+    normalise : bool, optional
+        If True, re-format the scenario names with normalise_scenario. The
+        names are re-formatted once per category, not once per row
+        
+    Return
+    ------
+    Pandas DataFrame
+    """
+    for col in category_cols:
+        if (col in df.columns):
+            df[col] = df[col].astype('category')
+    if (normalise and 'scenario' in df.columns):
+        categories = df['scenario'].cat.categories
+        new_categories = [normalise_scenario(str(x)) for x in categories]
+        if (len(set(new_categories)) == len(new_categories)):
+            df['scenario'] = df['scenario'].cat.rename_categories(new_categories)
+        else:
+            # Both 'rcpXX' & 'rcp_XX' are present; merge them
+            df['scenario'] = df['scenario'].map(dict(zip(categories, new_categories))).astype('category')
+    if ('year' in df.columns):
+        df['year'] = df['year'].astype(np.int16)
+    if (float32 and 'value' in df.columns):
+        df['value'] = df['value'].astype(np.float32)
+    return df
+
+def read_output(path, float32=False, normalise=False):
+    """
+    Read a long-format Hector output CSV file, such as the output of the R
+    Hector 'fetchvars' function or a hector-rcmip run, into a DataFrame with
+    compact column types
+    
+    Params
+    ------
+    path : str
+        Absolute path of the output file
+    float32 : bool, optional
+        If True, store the 'value' column as float32. Default is False
+    normalise : bool, optional
+        If True, re-format the scenario names with normalise_scenario
+        
+    Return
+    ------
+    Pandas DataFrame
+    """
+    col_types = {col: 'category' for col in category_cols}
+    df = pd.read_csv(path, sep=',', header=0, dtype=col_types)
+    return apply_schema(df, float32=float32, normalise=normalise)
+
+def frame_memory(df):
+    """
+    Get the memory used by a DataFrame, including the contents of object
+    columns, in bytes
+    """
+    return int(df.memory_usage(deep=True).sum())
+
+# ============================= Output Discovery ===============================
+
+# Hector version, Ex: 'v2_3_0', '2.3.0', 'output_rcp45_v2.3.0.csv'
+version_pattern  = re.compile(r'(?:^|[^\d])v?(\d+)[._](\d+)[._](\d+)(?:[^\d]|$)')
+
+# Hector scenario, Ex: 'rcp45', 'rcp_45', 'ssp245'
+scenario_pattern = re.compile(r'(rcp|ssp)_?(\d{2,3})', re.IGNORECASE)
+
+def parse_version(path):
+    """
+    Get the Hector version from an output file path. The version is taken
+    from the name of the file's parent directory (Ex: 'v2_3_0'), or from the
+    file name if the directory name holds no version (Ex: 'output_v2.3.0.csv')
+    
+    Return
+    ------
+    str or None
+        Ex: '2.3.0'
+    """
+    path = path.replace('\\', '/')
+    for name in [basename(dirname(path)), basename(path)]:
+        match = re.search(version_pattern, name)
+        if (match):
+            return '.'.join(match.groups())
+    return None
+
+def parse_scenario(path):
+    """
+    Get the Hector scenario from an output file name
+    
+    Return
+    ------
+    str or None
+        Ex: 'rcp45'
+    """
+    match = re.search(scenario_pattern, basename(path.replace('\\', '/')))
+    if (match):
+        return ''.join(match.groups()).lower()
+    return None
+
+def sniff_format(path):
+    """
+    Determine the format of a Hector output file from its header
+    
+    Return
+    ------
+    str
+        'outputstream' for files written by Hector's C++ outputstream
+        functions, 'fetchvars' for files holding output from the R Hector
+        'fetchvars' function
+    """
+    with open(path, 'r') as f_in:
+        lines = [f_in.readline().strip().split(',') for _ in range(2)]
+    if ('scenario' in lines[0] and 'variable' in lines[0]):
+        return 'fetchvars'
+    elif ('spinup' in lines[1] and 'variable' in lines[1]):
+        return 'outputstream'
+    raise ValueError('Unable to determine the format of {}'.format(path))
+
+def discover_outputs(root, ext='.csv', require_version=True):
+    """
+    Walk a comparison root directory and find all Hector output files whose
+    version & scenario can be determined from the directory & file names
+    
+    Params
+    ------
+    root : str
+        Root directory. Ex: a directory holding one sub-directory per Hector
+        version, each holding one output file per scenario
+    ext : str, optional
+        Output file extension. Default is '.csv'
+    require_version : bool, optional
+        If False, also keep files with no version in their path, Ex: output
+        of hector-rcmip runs. Their version is None. Default is True
+        
+    Return
+    ------
+    Pandas DataFrame
+        Columns: ['version', 'scenario', 'format', 'path']
+    """
+    runs = []
+    for dir_path, _, f_names in walk(root):
+        for f_name in sorted(f_names):
+            if (not f_name.endswith(ext)):
+                continue
+            f_path = join(dir_path, f_name)
+            version  = parse_version(f_path)
+            scenario = parse_scenario(f_name)
+            if (not scenario or (require_version and not version)):
+                continue
+            try:
+                f_format = sniff_format(f_path)
+            except ValueError:
+                continue
+            runs.append((version, scenario, f_format, f_path))
+    runs = pd.DataFrame(runs, columns=['version', 'scenario', 'format', 'path'])
+    return runs.sort_values(['version', 'scenario']).reset_index(drop=True)
+
+# ========================= Define OutputIndex Class ===========================
+
+class OutputIndex:
+    """
+    Index of a long-format Hector output DataFrame by variable. Each variable's
+    output is held in contiguous, year-sorted Numpy arrays so that lookups
+    do not need to scan the DataFrame
+    """
+    
+    def __init__(self, df):
+        """
+        Constructor for the OutputIndex class
+        
+        Params
+        ------
+        df : Pandas DataFrame
+            Long-format Hector output. Must have 'variable', 'year', 'value',
+            & 'units' columns
+        """
+        self._index = {}
+        df = df.sort_values(['variable', 'year'], kind='mergesort')
+        for var, var_df in df.groupby('variable', sort=False, observed=True):
+            years  = np.ascontiguousarray(var_df['year'].to_numpy())
+            values = np.ascontiguousarray(var_df['value'].to_numpy())
+            units  = var_df['units'].iloc[0]
+            self._index[var] = (years, values, units)
+    
+    @property
+    def variables(self):
+        return list(self._index.keys())
+    
+    def __contains__(self, var):
+        return var in self._index
+    
+    def cache_key(self):
+        """
+        Data the index holds, used to hash it for the render cache
+        """
+        return [(var,) + self._index[var] for var in sorted(self._index)]
+    
+    def get(self, var, years=None):
+        """
+        Get the output for a variable
+        
+        Params
+        ------
+        var : str
+            Output variable
+        years : tuple of (int, int), optional
+            If given, only output from the years [year_min, year_max] is
+            returned
+            
+        Return
+        ------
+        tuple of (Numpy array, Numpy array, str)
+            Years, values, & units. The arrays are views into the index and
+            must not be modified
+        """
+        yrs, vals, units = self._index[var]
+        if (years):
+            idx_min = np.searchsorted(yrs, int(years[0]), side='left')
+            idx_max = np.searchsorted(yrs, int(years[1]), side='right')
+            yrs  = yrs[idx_min:idx_max]
+            vals = vals[idx_min:idx_max]
+        return (yrs, vals, units)
 
 # ========================= Define HectorOutput Class ==========================
 
@@ -22,7 +273,8 @@ class HectorOutput:
     A simple class to represent a Hector output file
     """
     
-    def __init__(self, abs_path, years=None, vars=None):
+    def __init__(self, abs_path, years=None, vars=None, float32=False,
+                 scenario=None, version=None, fmt=None):
         """
         Constructor for the HectorOutput class
         
@@ -30,10 +282,6 @@ class HectorOutput:
         ------
         abs_path : str
             Absolute path of the output file.
-        scenario : str
-            Hector RCP scenario. Format: 'rcp_XX'
-        version : str
-            Hector version that produced the output file.
         years : tuple, optional
             If given, the output held in the DataFrame will be limited to the 
             range defined by (year_min, year_max). Default is to include all
@@ -42,6 +290,18 @@ class HectorOutput:
             List of Hector output variables to filter. If given, only output 
             from these variables will be held in the DataFrame. Default is 
             to include all variables.
+        float32 : bool, optional
+            If True, output values are held as float32 instead of float64.
+            Default is False
+        scenario : str, optional
+            Hector scenario. Format: 'rcpXX'. Default is to parse it from the
+            file name
+        version : str, optional
+            Hector version that produced the output file. Default is to parse
+            it from the parent directory or file name
+        fmt : str, optional
+            File format, 'outputstream' or 'fetchvars'. Default is to determine
+            it from the file header when the output is read
             
         Instance Attributes
         --------------------
@@ -52,7 +312,8 @@ class HectorOutput:
         * scenario : str
             Hector RCP scenario
         * output : Pandas DataFrame
-            The Hector output
+            The Hector output. The output file is not read until this attribute
+            is first accessed
         * year_first : str
             First output year
         * year_last
@@ -62,30 +323,70 @@ class HectorOutput:
             
         Example usage
         --------------
-        HectorOutput(<path>, "rcp45", "2.3.0", years=(1900, 2300), vars=['Ca', 'Tgav']
+        HectorOutput(<path>, years=(1900, 2300), vars=['Ca', 'Tgav'], scenario="rcp45", version="2.3.0")
         """
         if (not exists(abs_path)):
             raise FileNotFoundError('Could not locate {}'.format(abs_path)) 
         self.path        = abs_path
-        self.scenario    = self._parse_scenario(abs_path)
-        self.version     = self._parse_version(abs_path)
+        self.scenario    = scenario if scenario else self._parse_scenario(abs_path)
+        self.version     = version if version else self._parse_version(abs_path)
+        self.format      = fmt
         self.year_first  = None
         self.year_last   = None
         self.output_vars = vars
-        self.output = self._parse_output(abs_path, vars=vars, years=years)
+        self._years      = years
+        self._float32    = float32
+        self._output     = None
+        self._index      = None
         self._parse_years(years)
+
+    @property
+    def output(self):
+        """
+        Hector output DataFrame, read from the output file on first access
+        """
+        if (self._output is None):
+            self._output = self._parse_output(self.path, vars=self.output_vars,
+                                              years=self._years)
+        return self._output
+
+    @property
+    def index(self):
+        """
+        OutputIndex of the output, built on first access
+        """
+        if (self._index is None):
+            self._index = OutputIndex(self.output)
+        return self._index
+
+    def get(self, var, years=None):
+        """
+        Get the output for a variable. See OutputIndex.get
+        
+        Return
+        ------
+        tuple of (Numpy array, Numpy array, str)
+            Years, values, & units
+        """
+        return self.index.get(var, years=years)
+
+    def cache_key(self):
+        """
+        Version, scenario, & output data, used to hash the object for the
+        render cache. The file path is left out so that moved files still hit
+        """
+        return (self.version, self.scenario, self.index)
         
     def _parse_scenario(self, path):
-        pattern = re.compile(r'_(rcp\d{2})')
-        match = re.search(pattern, path)
-        scenario = match.groups()[0]
+        scenario = parse_scenario(path)
+        if (not scenario):
+            raise ValueError('Unable to parse the scenario from {}'.format(path))
         return scenario
         
     def _parse_version(self, path):
-        splits  = path.split('\\')
-        if (len(splits) == 1):
-            splits = path.split('/')  # Linux case
-        version  = splits[-2].replace('v', '').replace('_', '.')
+        version = parse_version(path)
+        if (not version):
+            raise ValueError('Unable to parse the version from {}'.format(path))
         return version
     
     def _parse_years(self, years):
@@ -101,10 +402,65 @@ class HectorOutput:
         """
         # Hector outputstream csv files have a version string in row 0 that we
         # need to discard
-        if (self.version != '2.3.0'):
-            return self._parse_outputstream(path, vars=vars, years=years)
+        if (not self.format):
+            self.format = sniff_format(path)
+        if (self.format == 'outputstream'):
+            df_out = self._parse_outputstream(path, vars=vars, years=years)
         else:
-            return self._parse_fetchvars(path, vars=vars, years=years)        
+            df_out = self._parse_fetchvars(path, vars=vars, years=years)
+        # Re-format the scenario names to match current Hector versions
+        # Ex: 'rcp45' --> 'rcp_45'
+        return apply_schema(df_out, float32=self._float32, normalise=True)
+
+    def _read_filtered(self, path, cols, skiprows=None, header=0, vars=None,
+                       years=None, chunksize=100000):
+        """
+        Read a Hector output CSV file in chunks, keeping only the given columns
+        and filtering out spin-up rows, unwanted variables, & unwanted years
+        from each chunk as it is read
+
+        Params
+        ------
+        path : str
+            Absolute path of the output file
+        cols : list of str
+            Columns to read. Columns not present in the file are ignored
+        skiprows : int, optional
+            Passed to pandas.read_csv
+        header : int, optional
+            Passed to pandas.read_csv
+        vars : str or list of str, optional
+            Output variables to keep
+        years : tuple of int or tuple of str, optional
+            (year_min, year_max) range of years to keep
+        chunksize : int, optional
+            Number of rows to parse per chunk
+
+        Return
+        ------
+        Pandas DataFrame
+        """
+        if (vars and not isinstance(vars, list)):  # Cast as list, if needed
+            vars = [vars]
+        reader = pd.read_csv(path, sep=',', skiprows=skiprows, header=header,
+                             usecols=lambda col: col in cols, chunksize=chunksize)
+        chunks = []
+        for chunk in reader:
+            mask = np.ones(len(chunk), dtype=bool)
+            # Extract only non-spinup output
+            if ('spinup' in chunk.columns):
+                mask &= (chunk['spinup'] != 1).to_numpy()
+            if (vars):
+                mask &= chunk['variable'].isin(vars).to_numpy()
+            if (years):
+                yr_min = int(years[0])
+                yr_max = int(years[1])
+                mask &= ((chunk['year'] >= yr_min) & (chunk['year'] <= yr_max)).to_numpy()
+            chunks.append(chunk.loc[mask])
+        df_out = pd.concat(chunks)
+        if ('spinup' in df_out.columns):
+            df_out = df_out.drop('spinup', axis=1)
+        return df_out
 
     def _parse_outputstream(self, path, vars=None, years=None):
         """
@@ -139,26 +495,13 @@ class HectorOutput:
         """
         skipr = 0
         headr = 1
-        df_out = pd.read_csv(path, sep=',', skiprows=skipr, header=headr)
-        # Extract only non-spinup output
-        df_out = df_out.loc[df_out['spinup'] != 1]
-        # Drop the 'spinup' & 'component' columns
-        df_out = df_out.drop(['spinup', 'component'], axis=1)
+        # The 'component' column is not needed
+        cols = ['run_name', 'spinup', 'variable', 'year', 'value', 'units']
+        df_out = self._read_filtered(path, cols, skiprows=skipr, header=headr,
+                                     vars=vars, years=years)
         # Rename the 'run_name' column as 'scenario' to match R Hector output
+        # The scenario names are re-formatted by _parse_output
         df_out = df_out.rename(columns={'run_name': 'scenario'})
-        # Re-format the 'scenario' column to match current Hector versions
-        # Ex: 'rcp45' --> 'rcp_45'
-        df_out['scenario'] = df_out['scenario'].apply(lambda x: x[:3] + '_' + x[3:])
-        # Subset the desired output variables, if applicable
-        if (vars):
-            if (not isinstance(vars, list)):  # Cast as list, if needed
-                vars = [vars]
-            df_out = df_out.loc[df_out['variable'].isin(vars)]
-        # Extract a tim subset, if applicable
-        if (years):
-            yr_min = int(years[0])
-            yr_max = int(years[1])
-            df_out = df_out.loc[(df_out['year'] >= yr_min) & (df_out['year'] <= yr_max)]
         return df_out
         
     def _parse_fetchvars(self, path, vars=None, years=None):
@@ -187,17 +530,9 @@ class HectorOutput:
         """
         skipr = None
         headr = 0
-        df_out = pd.read_csv(path, sep=',', skiprows=skipr, header=headr)
-        # Subset the desired output variables, if applicable
-        if (vars):
-            if (not isinstance(vars, list)):  # Cast as list, if needed
-                vars = [vars]
-            df_out = df_out.loc[df_out['variable'].isin(vars)]
-        # Extract a tim subset, if applicable
-        if (years):
-            yr_min = int(years[0])
-            yr_max = int(years[1])
-            df_out = df_out.loc[(df_out['year'] >= yr_min) & (df_out['year'] <= yr_max)]
+        cols = ['scenario', 'year', 'variable', 'value', 'units']
+        df_out = self._read_filtered(path, cols, skiprows=skipr, header=headr,
+                                     vars=vars, years=years)
         return df_out
         
 # =============================== Plotting Funcs ===============================
@@ -208,35 +543,41 @@ def trim_axs(axs, N):
         ax.remove()
     return axs[:N]
 
-def plot_variables(hector_output, vars, years=(1750, 2300), scenario='RCP45'):
+def plot_variables(hector_output, vars, years=(1750, 2300), scenario='RCP45',
+                   out_dir=None, fmt='pdf'):
     """
     Plot output from HectorOutput objects
     
     Parameters
     -----------
     hector_output: dict
-        Dictionary of {str: HectorOutput obj}
+        Dictionary of {str: HectorOutput obj}, keyed by version
     vars : list of str
         Output variables to plot
+    out_dir : str, optional
+        If given, save the figure to this directory instead of showing it
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'pdf'
+        
+    Return
+    ------
+    str or None
+        Path of the saved figure, if it was saved
     """
-    versions = ['2.0.0', '2.0.1', '2.1.0', '2.3.0']
+    versions = list(hector_output.keys())
     plt.style.use('ggplot')
-    colors = cm.tab20(np.linspace(0, 1, len(vars)))
+    colors = cm.tab20(np.linspace(0, 1, max(len(vars), len(versions))))
     figsize = (10, 8)
     cols = 4
     rows = 4
     fig, axs = plt.subplots(rows, cols, figsize=figsize, dpi=150, constrained_layout=True)
     fig.suptitle('Hector Output by Version - {}'.format(scenario), fontsize=16)
     axs = trim_axs(axs, len(vars))
-    x = np.asarray([x for x in range(years[0], years[1] + 1)])
     for ax, var in zip(axs, vars):
         ax.set_title(var)
         for version_idx, version in enumerate(versions):
             print(var, version)
-            version_df = hector_output[version].output
-            var_df = version_df.loc[version_df['variable'] == var]
-            units  = var_df['units'].unique().tolist()[0]
-            y = np.asarray(var_df['value'])
+            x, y, units = hector_output[version].get(var, years=years)
             ax.plot(x, y, c=colors[version_idx], ls='-', lw=1, label=version)
         ax.set_ylabel('{}'.format(units))
         ax.set_xticks([1750, 1850, 1950, 2050, 2150, 2250])
@@ -248,54 +589,270 @@ def plot_variables(hector_output, vars, years=(1750, 2300), scenario='RCP45'):
     for legobj in leg.legendHandles:
         legobj.set_linewidth(3.0)
     f_name = 'version-comparison-{}.pdf'.format(scenario)
-    figManager = plt.get_current_fig_manager()
-    figManager.window.showMaximized()
-    plt.show()
-
-def generate_obj(out_file):
-    def _parse_key(f_path):
-        pattern = re.compile(r'_(rcp\d{2})')
-        match = re.search(pattern, f_path)
-        scenario = match.groups()[0]
-        splits  = f_path.split('\\')
-        if (len(splits) == 1):
-            splits = f_path.split('/')  # Linux case
-        version  = splits[-2].replace('v', '').replace('_', '.')
-        # k = '{}-{}'.format(version, scenario)
-        k = version
-        return k
-    key = _parse_key(out_file)
-    obj = HectorOutput(out_file, years=(1750, 2300), vars=vars)
-    return (key, obj)
-
-root_output = 'C:\\Users\\nich980\\data\\hector\\version-comparison'
-
-### Hector variables that we're interested in
-# Hector outputstream vars (Pre-v2.x.x)
-# 'ocean_c' is unavail for the current Hector
-# vars_old = ['Tgav', 'Ca', 'atmos_c', 'veg_c', 'detritus_c', 'soil_c', 'ocean_c',
-            # 'FCO2', 'Ftot']
-
-# Current Hector (>= v2.3.0) vars
-# vars_curr = ['Tgav', 'Ca', 'atmos_c', 'veg_c', 'detritus_c', 'soil_c', 'FCO2', 'Ftot']
-vars = ['Tgav', 'Ca', 'atmos_c', 'veg_c', 'detritus_c', 'soil_c', 'FCO2', 'Ftot'] 
- 
-output_dict = {
-    'v2_0_0': 'outputstream_rcp45.csv',
-    'v2_0_1': 'outputstream_rcp45.csv',
-    'v2_1_0': 'outputstream_rcp45.csv',
-    'v2_3_0': 'output_rcp45_v2.3.0.csv',
-    }
-# Construct absolute paths of all output files
-out_files = [join(root_output, key, val) for (key, val) in output_dict.items()]
-
-# Create a dictionary where the key is 'version-scenario' and the value is the
-# corresponding HectorOutput object
-# Ex: '2.0.0-rcp26':  <__main__.HectorOutput object at...
-output = {key: val for (key, val) in [generate_obj(f) for f in out_files]}
-
-plot_variables(output, vars, years=(1750, 2300), scenario='RCP45')
+    return finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt)
+
+def generate_obj(out_file, years=(1750, 2300), vars=None, key='version', float32=False,
+                 version=None):
+    """
+    Create a HectorOutput object for an output file
+    
+    Params
+    ------
+    out_file : str
+        Absolute path of the Hector output file
+    years : tuple of (int, int), optional
+        Passed to HectorOutput
+    vars : list of str, optional
+        Passed to HectorOutput
+    key : str, optional
+        Key format. Either 'version' (Ex: '2.0.0'), 'version-scenario'
+        (Ex: '2.0.0-rcp45'), 'run' (Ex: ('2.0.0', 'rcp45')), or 'path' (the
+        output file path). Default is 'version'
+    float32 : bool, optional
+        Passed to HectorOutput
+    version : str, optional
+        Passed to HectorOutput. Default is to parse it from the path
+        
+    Return
+    ------
+    tuple of (str or tuple, HectorOutput)
+    """
+    obj = HectorOutput(out_file, years=years, vars=vars, float32=float32,
+                       version=version)
+    if (key == 'version-scenario'):
+        obj_key = '{}-{}'.format(obj.version, obj.scenario)
+    elif (key == 'run'):
+        obj_key = (obj.version, obj.scenario)
+    elif (key == 'path'):
+        obj_key = out_file
+    else:
+        obj_key = obj.version
+    return (obj_key, obj)
+
+
+def _load_obj(out_file, years, vars, key, float32, version=None):
+    """
+    Create a HectorOutput object and read its output file. Helper function
+    for load_outputs
+    
+    Return
+    ------
+    tuple of (str, HectorOutput, float)
+        Key, HectorOutput object, & load time in seconds
+    """
+    t_start = time.perf_counter()
+    obj_key, obj = generate_obj(out_file, years=years, vars=vars, key=key,
+                                float32=float32, version=version)
+    obj.output  # Force the lazy read
+    return (obj_key, obj, time.perf_counter() - t_start)
+
+
+def load_outputs(out_files, years=(1750, 2300), vars=None, key='version',
+                 max_workers=None, use_processes=False, float32=False, versions=None):
+    """
+    Create & load HectorOutput objects for a list of output files in parallel
+    
+    Params
+    ------
+    out_files : list of str
+        Absolute paths of the Hector output files
+    years : tuple of (int, int), optional
+        Passed to HectorOutput
+    vars : list of str, optional
+        Passed to HectorOutput
+    key : str, optional
+        Key format, see generate_obj. Default is 'version'
+    max_workers : int, optional
+        Number of worker threads or processes. Default is one per file
+    use_processes : bool, optional
+        If True, load the files in a process pool instead of a thread pool
+    float32 : bool, optional
+        Passed to HectorOutput
+    versions : dict of {str: str}, optional
+        Hector versions of output files whose paths hold no version, keyed
+        by path. Ex: output of hector-rcmip runs
+        
+    Return
+    ------
+    dict of {str: HectorOutput}
+    
+    Example usage
+    --------------
+    output = load_outputs(out_files, vars=['Tgav', 'Ca'], key='version-scenario')
+    """
+    if (not max_workers):
+        max_workers = max(len(out_files), 1)
+    if (use_processes):
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    if (not versions):
+        versions = {}
+    loaded = {}
+    t_start = time.perf_counter()
+    with executor:
+        futures = {executor.submit(_load_obj, f, years, vars, key, float32, versions.get(f)): f
+                   for f in out_files}
+        for future in as_completed(futures):
+            obj_key, obj, t_load = future.result()
+            print('Loaded {} in {:.2f} s'.format(futures[future], t_load))
+            loaded[futures[future]] = (obj_key, obj)
+    t_total = time.perf_counter() - t_start
+    print('Loaded {} files in {:.2f} s'.format(len(out_files), t_total))
+    # Preserve the order of out_files. Files sharing a key would overwrite
+    # each other, Ex: two scenarios of one version with key='version'
+    output = {}
+    key_paths = {}
+    for f in out_files:
+        obj_key, obj = loaded[f]
+        if (obj_key in output):
+            raise ValueError("Output files {} & {} have the same key '{}'. Use "
+                             "key='run' or key='path'".format(
+                             key_paths[obj_key], f, obj_key))
+        output[obj_key] = obj
+        key_paths[obj_key] = f
+    return output
+
+# ============================ Multi-version Store =============================
+
+class OutputStore:
+    """
+    Hector output from every version & scenario found under a comparison root
+    directory, indexed by version, scenario, variable, & year
+    """
+    
+    def __init__(self, root, years=None, vars=None, float32=False, max_workers=None):
+        """
+        Constructor for the OutputStore class. Discovers & loads all output
+        files under the root directory
+        
+        Params
+        ------
+        root : str
+            Comparison root directory, see discover_outputs
+        years : tuple of (int, int), optional
+            Passed to HectorOutput
+        vars : list of str, optional
+            Passed to HectorOutput
+        float32 : bool, optional
+            Passed to HectorOutput
+        max_workers : int, optional
+            Passed to load_outputs
+            
+        Instance Attributes
+        --------------------
+        * root : str
+            Comparison root directory
+        * runs : Pandas DataFrame
+            Discovered output files, see discover_outputs
+        * outputs : dict of {(str, str): HectorOutput}
+            HectorOutput objects keyed by (version, scenario)
+        * data : Pandas DataFrame
+            All output, indexed by (version, scenario, variable, year). Built
+            on first access
+            
+        Example usage
+        --------------
+        store = OutputStore(<root>, years=(1750, 2300), vars=['Ca', 'Tgav'])
+        plot_variables(store.select('rcp45'), ['Ca', 'Tgav'], scenario='RCP45')
+        """
+        self.root    = root
+        self.runs    = discover_outputs(root)
+        # load_outputs raises if two files hold the same version & scenario
+        self.outputs = load_outputs(self.runs['path'].tolist(), years=years, vars=vars,
+                                    key='run', max_workers=max_workers, float32=float32)
+        self._data   = None
+        
+    @property
+    def versions(self):
+        return sorted(set(k[0] for k in self.outputs.keys()))
+        
+    @property
+    def scenarios(self):
+        return sorted(set(k[1] for k in self.outputs.keys()))
+    
+    @property
+    def data(self):
+        if (self._data is None):
+            frames = []
+            for (version, scenario), obj in self.outputs.items():
+                df = obj.output[['variable', 'year', 'value', 'units']]
+                frames.append(df.assign(version=version, scenario=scenario))
+            data = apply_schema(pd.concat(frames, ignore_index=True))
+            data = data.set_index(['version', 'scenario', 'variable', 'year'])
+            self._data = data.sort_index()
+        return self._data
+        
+    def select(self, scenario):
+        """
+        Get the output of every version for a scenario
+        
+        Params
+        ------
+        scenario : str
+            Hector scenario. Ex: 'rcp45', 'RCP45', or 'rcp_45'
+            
+        Return
+        ------
+        dict of {str: HectorOutput}
+            Keyed by version, in version order
+        """
+        scenario = parse_scenario(scenario)
+        return {v: self.outputs[(v, s)] for (v, s) in sorted(self.outputs.keys())
+                if s == scenario}
+        
+    def get(self, version, scenario, var, years=None):
+        """
+        Get the output for a variable. See OutputIndex.get
+        
+        Return
+        ------
+        tuple of (Numpy array, Numpy array, str)
+            Years, values, & units
+        """
+        return self.outputs[(version, parse_scenario(scenario))].get(var, years=years)
+
+# ==================================== Main ====================================
+
+if __name__ == '__main__':
+    root_output = 'C:\\Users\\nich980\\data\\hector\\version-comparison'
+
+    ### Hector variables that we're interested in
+    # Hector outputstream vars (Pre-v2.x.x)
+    # 'ocean_c' is unavail for the current Hector
+    # vars_old = ['Tgav', 'Ca', 'atmos_c', 'veg_c', 'detritus_c', 'soil_c', 'ocean_c',
+                # 'FCO2', 'Ftot']
 
+    # Current Hector (>= v2.3.0) vars
+    # vars_curr = ['Tgav', 'Ca', 'atmos_c', 'veg_c', 'detritus_c', 'soil_c', 'FCO2', 'Ftot']
+    vars = ['Tgav', 'Ca', 'atmos_c', 'veg_c', 'detritus_c', 'soil_c', 'FCO2', 'Ftot'] 
 
+    parse_desc = """Compare output from various Hector versions"""
+    parser = argparse.ArgumentParser(description=parse_desc)
+    parser.add_argument('-r', '--root', dest='root_output', default=root_output,
+                        action='store', help='Comparison root directory')
+    parser.add_argument('-o', '--out-dir', dest='out_dir', default=None, action='store',
+                        help='Render all figures to this directory instead of showing them')
+    parser.add_argument('--fmt', dest='fmt', default='pdf', action='store',
+                        help='Figure file format used with --out-dir')
+    parser.add_argument('-n', '--workers', dest='workers', type=int, default=None,
+                        action='store', help='Number of rendering processes')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help='Re-render every figure, even if its inputs are unchanged')
+    args = parser.parse_args()
 
+    # Find & load the output of every version & scenario under root_output.
+    # Expected layout: <root_output>/v2_3_0/output_rcp45_v2.3.0.csv
+    store = OutputStore(args.root_output, years=(1750, 2300), vars=vars)
 
+    if (args.out_dir):
+        # One figure per scenario, rendered headlessly in parallel
+        jobs = [(plot_variables, (store.select(scenario), vars),
+                 {'years': (1750, 2300), 'scenario': scenario.upper()})
+                for scenario in store.scenarios]
+        render_batch(jobs, args.out_dir, fmt=args.fmt, max_workers=args.workers,
+                     use_cache=args.use_cache)
+    else:
+        for scenario in store.scenarios:
+            plot_variables(store.select(scenario), vars, years=(1750, 2300),
+                           scenario=scenario.upper())
@@ -0,0 +1,295 @@
+"""
+Matt Nicholson
+19 Oct 2026
+
+Numeric comparison of output from various versions of PNNL-JGCRI's Hector
+Simple Climate Model. Every variable is aligned on year and compared for every
+pair of versions of each scenario, without plotting, so that the comparison can gate new Hector
+releases in batch jobs.
+
+Example usage
+--------------
+python diff_versions.py -f v2_3_0/output_rcp45_v2.3.0.csv v2_4_0/output_rcp45_v2.4.0.csv
+                           v2_3_0/output_rcp85_v2.3.0.csv v2_4_0/output_rcp85_v2.4.0.csv
+                        --rel-drift 0.01 -o diff-rcps.csv
+"""
+import argparse
+import sys
+import matplotlib
+matplotlib.use('Agg')  # Never open a display
+import numpy as np
+import pandas as pd
+
+from itertools import combinations
+
+from compare_versions import load_outputs
+
+# Metrics computed for every (scenario, version pair, variable). Relative drift
+# metrics are added per drift year, Ex: 'rel_drift_2100'
+metric_cols = ['max_abs_diff', 'rmse']
+
+# ============================== Diff Functions ================================
+
+def _long_output(output, vars, years):
+    """
+    Get the (variable, year, value) rows of one output to compare, with one
+    row per variable & year. Helper function for diff_versions
+    """
+    df = output.output
+    mask = df['variable'].isin(vars)
+    if (years):
+        mask &= (df['year'] >= years[0]) & (df['year'] <= years[1])
+    df = df.loc[mask, ['variable', 'year', 'value', 'units']]
+    df = df.assign(variable=df['variable'].astype(str), value=df['value'].astype(float))
+    return df.drop_duplicates(['variable', 'year'], keep='first')
+
+
+def _units(output, vars):
+    """
+    Get the units of each variable of one output, in the order of vars.
+    Helper function for diff_versions
+    """
+    units = output.output.drop_duplicates('variable')
+    units = units.assign(variable=units['variable'].astype(str)).set_index('variable')['units']
+    return units.reindex(vars).to_numpy()
+
+
+def diff_metrics(aligned, drift_years=(2100, 2300)):
+    """
+    Compute difference metrics for every group of aligned timeseries at once
+
+    Params
+    ------
+    aligned : Pandas DataFrame
+        One row per shared year of each compared timeseries. Columns: the
+        group columns, Ex: ['scenario', 'version_a', 'version_b', 'variable'],
+        & 'year', 'value_a' (reference), & 'value_b'. Every column other than
+        'year', 'value_a', & 'value_b' identifies a group
+    drift_years : tuple of int, optional
+        Years at which the relative drift, (b - a) / |a|, is reported. The
+        drift is NaN if the year is missing from the shared years or a value
+        is NaN, & +/-inf if a is 0 & b is not
+
+    Return
+    ------
+    Pandas DataFrame
+        One row per group, indexed by the group columns. Columns: n_years,
+        first_year, last_year, max_abs_diff, rmse, rel_drift_<year>...
+        NaN values make max_abs_diff & rmse NaN
+    """
+    keys = [col for col in aligned.columns if col not in ['year', 'value_a', 'value_b']]
+    value_a = aligned['value_a'].to_numpy(dtype=float)
+    diff = aligned['value_b'].to_numpy(dtype=float) - value_a
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drift = np.where(value_a != 0, diff / np.abs(value_a),
+                         np.where(diff == 0, 0.0, np.copysign(np.inf, diff)))
+    drift[np.isnan(diff)] = np.nan
+    frame = aligned[keys + ['year']].assign(abs_diff=np.abs(diff), sq_diff=diff ** 2,
+                                            is_nan=np.isnan(diff), drift=drift)
+    grouped = frame.groupby(keys, sort=False)
+    metrics = grouped['year'].agg(['size', 'min', 'max'])
+    metrics.columns = ['n_years', 'first_year', 'last_year']
+    has_nan = grouped['is_nan'].any()
+    metrics['max_abs_diff'] = grouped['abs_diff'].max().where(~has_nan)
+    metrics['rmse'] = np.sqrt(grouped['sq_diff'].mean()).where(~has_nan)
+    for yr in drift_years:
+        yr_drift = frame.loc[frame['year'] == yr].set_index(keys)['drift']
+        metrics['rel_drift_{}'.format(yr)] = yr_drift.reindex(metrics.index)
+    return metrics
+
+
+def check_thresholds(table, thresholds):
+    """
+    Add a pass/fail column to a diff table
+
+    Params
+    ------
+    table : Pandas DataFrame
+        Diff table returned by diff_versions
+    thresholds : dict
+        Maximum allowed metric values. Keys are metric names ('max_abs_diff',
+        'rmse', 'rel_drift') and apply to every variable, or variable names
+        mapped to dicts of metric thresholds for that variable. A 'rel_drift'
+        threshold applies to the absolute value of every drift year.
+        Ex: {'rel_drift': 0.01, 'Tgav': {'max_abs_diff': 0.05}}
+
+    Return
+    ------
+    Pandas DataFrame
+        A metric fails if it is over its threshold, or if it has a threshold
+        & could not be computed (NaN), Ex: no shared years or NaN output. A
+        drift year outside a row's shared years is not checked
+    """
+    default = {k: v for k, v in thresholds.items() if not isinstance(v, dict)}
+    drift_cols = [col for col in table.columns if col.startswith('rel_drift_')]
+    passed = np.ones(len(table), dtype=bool)
+    for metric in metric_cols + ['rel_drift']:
+        limit = pd.Series(default.get(metric, np.nan), index=table.index, dtype=float)
+        for var, var_thresh in thresholds.items():
+            if (isinstance(var_thresh, dict) and metric in var_thresh):
+                limit[table['variable'] == var] = var_thresh[metric]
+        cols = drift_cols if (metric == 'rel_drift') else [metric]
+        for col in cols:
+            vals = table[col].abs()
+            checked = limit.notna()
+            if (col in drift_cols):
+                # Drift years the pair does not share are not checked
+                yr = int(col[len('rel_drift_'):])
+                checked &= (table['first_year'] <= yr) & (table['last_year'] >= yr)
+            failed = checked & ((vals > limit) | vals.isna())
+            passed &= ~failed.to_numpy()
+    table['passed'] = passed
+    return table
+
+
+def diff_versions(hector_output, vars=None, years=None, drift_years=(2100, 2300),
+                  reference=None, thresholds=None):
+    """
+    Compare every variable for every pair of Hector versions of each scenario
+
+    Params
+    ------
+    hector_output : dict
+        Dictionary of {(str, str): HectorOutput obj}, keyed by (version,
+        scenario), Ex: returned by load_outputs(..., key='run')
+    vars : list of str, optional
+        Variables to compare. Default is every variable present in all
+        versions of a scenario
+    years : tuple of (int, int), optional
+        Only compare output from the years [year_min, year_max]
+    drift_years : tuple of int, optional
+        Years at which the relative drift is reported
+    reference : str, optional
+        If given, only compare each version of a scenario against this version
+        instead of comparing every pair
+    thresholds : dict, optional
+        Metric thresholds, see check_thresholds. If given, a 'passed' column is
+        added to the table
+
+    Return
+    ------
+    Pandas DataFrame
+        Columns: scenario, version_a, version_b, variable, units, n_years,
+                 first_year, last_year, max_abs_diff, rmse,
+                 rel_drift_<year>..., [passed]
+    """
+    versions = sorted(set(version for version, _ in hector_output.keys()))
+    if (len(versions) < 2):
+        raise ValueError('At least 2 Hector versions are needed, got {}'.format(versions))
+    if (reference and reference not in versions):
+        raise ValueError("Reference version '{}' is not in {}".format(reference, versions))
+    scn_versions = {}
+    pair_keys = []
+    rows = []
+    for version, scenario in hector_output.keys():
+        scn_versions.setdefault(scenario, []).append(version)
+    for scenario, scn_vers in scn_versions.items():
+        if (reference):
+            pairs = [(reference, v) for v in scn_vers if v != reference and reference in scn_vers]
+        else:
+            pairs = list(combinations(scn_vers, 2))
+        if (not pairs):
+            print('Skipping {}: no pair of versions to compare'.format(scenario))
+            continue
+        var_sets = {v: set(hector_output[(v, scenario)].index.variables) for v in scn_vers}
+        if (vars):
+            for version, var_set in var_sets.items():
+                missing = [var for var in vars if var not in var_set]
+                if (missing):
+                    raise ValueError('Variables {} are not in the {} output of version {}'.format(
+                                     missing, scenario, version))
+            scn_vars = vars
+        else:
+            scn_vars = sorted(set.intersection(*var_sets.values()))
+        pair_vers = set(version for pair in pairs for version in pair)
+        frames = {v: _long_output(hector_output[(v, scenario)], scn_vars, years)
+                  for v in pair_vers}
+        units = {v: _units(hector_output[(v, scenario)], scn_vars) for v in pair_vers}
+        for version_a, version_b in pairs:
+            # Inner join on (variable, year) keeps the years both versions share
+            aligned = frames[version_a].merge(frames[version_b].drop('units', axis=1),
+                                              on=['variable', 'year'], suffixes=('_a', '_b'))
+            aligned = aligned.assign(scenario=scenario, version_a=version_a,
+                                     version_b=version_b)
+            pair_keys.append(pd.DataFrame({'scenario': scenario, 'version_a': version_a,
+                                           'version_b': version_b, 'variable': scn_vars,
+                                           'units': units[version_a]}))
+            rows.append(aligned[['scenario', 'version_a', 'version_b', 'variable', 'year',
+                                 'value_a', 'value_b']])
+    if (not pair_keys):
+        raise ValueError('No scenario has output from 2 versions to compare')
+    # Every metric of every (scenario, pair, variable) in one groupby
+    keys = ['scenario', 'version_a', 'version_b', 'variable']
+    table = pd.concat(pair_keys, ignore_index=True)
+    metrics = diff_metrics(pd.concat(rows, ignore_index=True), drift_years=drift_years)
+    table = table.join(metrics, on=keys)
+    # Variables with no shared years still get a row
+    table['n_years'] = table['n_years'].fillna(0).astype(int)
+    if (thresholds):
+        table = check_thresholds(table, thresholds)
+    return table
+
+
+def summarize(table):
+    """
+    Summarize a diff table by variable
+
+    Params
+    ------
+    table : Pandas DataFrame
+        Diff table returned by diff_versions
+
+    Return
+    ------
+    Pandas DataFrame
+        Worst value of each metric over all version pairs, & whether every
+        pair passed, for each scenario & variable
+    """
+    drift_cols = [col for col in table.columns if col.startswith('rel_drift_')]
+    agg = {col: 'max' for col in metric_cols}
+    agg.update({col: lambda x: x.abs().max() for col in drift_cols})
+    if ('passed' in table.columns):
+        agg['passed'] = 'all'
+    return table.groupby(['scenario', 'variable'], sort=False).agg(agg)
+
+# ==================================== Main ====================================
+
+if __name__ == '__main__':
+    parse_desc = """Numerically compare output from various Hector versions"""
+    parser = argparse.ArgumentParser(description=parse_desc)
+    parser.add_argument('-f', '--files', dest='files', required=True, nargs='+',
+                        action='store', help='Absolute paths of the Hector output files')
+    parser.add_argument('-v', '--vars', dest='vars', nargs='+', default=None,
+                        action='store', help='Variables to compare')
+    parser.add_argument('-y', '--years', dest='years', nargs=2, type=int, default=None,
+                        action='store', help='First & last year to compare')
+    parser.add_argument('-r', '--reference', dest='reference', default=None,
+                        action='store', help='Compare every version against this version')
+    parser.add_argument('--max-abs', dest='max_abs_diff', type=float, default=None,
+                        action='store', help='Max allowed absolute difference')
+    parser.add_argument('--rmse', dest='rmse', type=float, default=None,
+                        action='store', help='Max allowed RMSE')
+    parser.add_argument('--rel-drift', dest='rel_drift', type=float, default=None,
+                        action='store', help='Max allowed relative drift')
+    parser.add_argument('-o', '--out', dest='out_path', default=None,
+                        action='store', help='Path of the output .csv diff table')
+    args = parser.parse_args()
+
+    thresholds = {k: getattr(args, k) for k in ['max_abs_diff', 'rmse', 'rel_drift']
+                  if getattr(args, k) is not None}
+
+    # Key by (version, scenario), so that every scenario of every version is kept
+    output = load_outputs(args.files, years=args.years, vars=args.vars, key='run')
+    try:
+        diff_table = diff_versions(output, vars=args.vars, years=args.years,
+                                   reference=args.reference, thresholds=thresholds)
+    except ValueError as err:
+        sys.exit('diff_versions: {}'.format(err))
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None,
+                           'display.width', 200):
+        print(summarize(diff_table))
+    if (args.out_path):
+        diff_table.to_csv(args.out_path, sep=',', header=True, index=False)
+        print('Diff table written to {}'.format(args.out_path))
+    if ('passed' in diff_table.columns and not diff_table['passed'].all()):
+        sys.exit(1)
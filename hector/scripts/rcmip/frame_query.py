@@ -0,0 +1,205 @@
+"""
+Matt Nicholson
+19 Oct 2026
+
+Lazy row filters over RCMIP emissions & Hector output/emissions DataFrames.
+Scenario, region, variable, & year filters are collected without being run,
+then combined into a single boolean mask that is evaluated in one pass over
+the frame, so that a chain of filters makes at most one copy of the data.
+
+Example usage
+--------------
+python frame_query.py rcmip-emissions-annual-means-v3-1-0.csv
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Column names used by each filter, in order of preference. RCMIP frames use
+# capitalized names, Hector output lower-case names, & Hector input emissions
+# a 'Date' column
+query_cols = {'scenario': ['Scenario', 'scenario'],
+              'region':   ['Region', 'region'],
+              'variable': ['Variable', 'variable'],
+              'year':     ['Year', 'year', 'Date']}
+
+def isin_mask(series, values):
+    """
+    Get a boolean mask of the values of a Series that are in values. For
+    categorical Series, only the categories are compared
+
+    Return
+    ------
+    Numpy array of bool
+    """
+    if (isinstance(series.dtype, pd.CategoricalDtype)):
+        cat_mask = np.append(series.cat.categories.isin(values), False)
+        # Code -1 (missing) selects the appended False
+        return cat_mask[series.cat.codes.to_numpy()]
+    return series.isin(values).to_numpy()
+
+class Query:
+    """
+    Lazy filter over the rows of a DataFrame. Filter methods return a new
+    Query & do not touch the data until mask(), collect(), or len() is called
+    """
+
+    def __init__(self, df, filters=()):
+        """
+        Constructor for the Query class
+
+        Params
+        ------
+        df : Pandas DataFrame
+            Frame to filter. RCMIP emissions, Hector output, or Hector input
+            emissions
+        filters : tuple, optional
+            Filters already applied. Used by the filter methods
+        """
+        self.df = df
+        self._filters = tuple(filters)
+
+    def _column(self, kind):
+        for col in query_cols[kind]:
+            if (col in self.df.columns):
+                return col
+        raise KeyError('No {} column in {}'.format(kind, self.df.columns.tolist()))
+
+    def _add(self, kind, op, values):
+        return Query(self.df, self._filters + ((self._column(kind), op, values),))
+
+    def scenario(self, *names):
+        return self._add('scenario', 'isin', names)
+
+    def region(self, *names):
+        return self._add('region', 'isin', names)
+
+    def variable(self, *names):
+        return self._add('variable', 'isin', names)
+
+    def years(self, first=None, last=None):
+        """
+        Keep the years [first, last]. Either bound may be None
+        """
+        return self._add('year', 'between', (first, last))
+
+    def where(self, column, *values):
+        """
+        Keep rows whose value in any column is one of values
+        """
+        return Query(self.df, self._filters + ((column, 'isin', values),))
+
+    def mask(self):
+        """
+        Evaluate every filter into a single boolean mask. Category filters
+        run first, and each filter only looks at the rows that passed the
+        filters before it
+
+        Return
+        ------
+        Numpy array of bool
+        """
+        idx = None
+        for col, op, values in sorted(self._filters, key=lambda f: f[1] != 'isin'):
+            series = self.df[col]
+            if (idx is not None):
+                series = series.iloc[idx]
+            if (op == 'isin'):
+                keep = isin_mask(series, values)
+            else:
+                vals = series.to_numpy()
+                if (vals.dtype.kind not in 'iuf'):
+                    vals = pd.to_numeric(series).to_numpy()
+                keep = np.ones(len(vals), dtype=bool)
+                if (values[0] is not None):
+                    keep &= (vals >= values[0])
+                if (values[1] is not None):
+                    keep &= (vals <= values[1])
+            idx = np.flatnonzero(keep) if (idx is None) else idx[keep]
+        mask = np.ones(len(self.df), dtype=bool)
+        if (idx is not None):
+            mask[:] = False
+            mask[idx] = True
+        return mask
+
+    def collect(self):
+        """
+        Get the selected rows. The frame itself is returned if no rows are
+        filtered out, a positional slice if the selected rows are contiguous,
+        & otherwise a single copy
+
+        Return
+        ------
+        Pandas DataFrame
+        """
+        if (not self._filters):
+            return self.df
+        mask = self.mask()
+        idx = np.flatnonzero(mask)
+        if (len(idx) == len(mask)):
+            return self.df
+        if (len(idx) and idx[-1] - idx[0] + 1 == len(idx)):
+            return self.df.iloc[idx[0]:idx[-1] + 1]
+        return self.df.iloc[idx]
+
+    def values(self, column):
+        """
+        Get one column of the selected rows as a Numpy array, without copying
+        the other columns
+        """
+        return self.df[column].to_numpy()[self.mask()]
+
+    def __len__(self):
+        return int(self.mask().sum())
+
+# ================================= Benchmark ==================================
+
+def measure(func, *args):
+    """
+    Time a function & record its peak traced memory allocation
+
+    Return
+    ------
+    tuple of (object, float, int)
+        Return value, time in seconds, & peak memory in bytes
+    """
+    tracemalloc.start()
+    t_start = time.perf_counter()
+    result = func(*args)
+    t_elapsed = time.perf_counter() - t_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (result, t_elapsed, peak)
+
+def _chained(long_df, scenarios, variable, years):
+    """
+    The subset_rcmip_scenario -> subset_em_years -> .loc chain of
+    plot_rcmip_ems, for comparison
+    """
+    out = []
+    for scenario in scenarios:
+        scn_df = long_df.loc[(long_df['Scenario'] == scenario) &
+                             (long_df['Region'] == 'World')].copy()
+        scn_df['Year'] = pd.to_numeric(scn_df['Year'])
+        scn_df = scn_df.loc[(scn_df['Year'] >= years[0]) & (scn_df['Year'] <= years[1])].copy()
+        out.append(scn_df.loc[scn_df['Variable'] == variable]['Value'].to_numpy())
+    return out
+
+def _fused(long_df, scenarios, variable, years):
+    query = Query(long_df).region('World').variable(variable).years(*years)
+    return [query.scenario(scenario).values('Value') for scenario in scenarios]
+
+if __name__ == '__main__':
+    from plot_rcmip_ems import wide_to_long
+    scenarios = ['rcp60', 'rcp45', 'ssp119', 'ssp370']
+    args = (scenarios, 'Emissions|N2O', (1850, 1950))
+    long_df = wide_to_long(pd.read_csv(sys.argv[1], sep=',', header=0))
+    print('Full RCMIP table: {} rows, {:.1f} MB'.format(
+          len(long_df), long_df.memory_usage(deep=True).sum() / 1e6))
+    res_chain, t_chain, peak_chain = measure(_chained, long_df, *args)
+    res_fused, t_fused, peak_fused = measure(_fused, long_df, *args)
+    assert all(np.allclose(a, b, equal_nan=True) for a, b in zip(res_chain, res_fused))
+    print('Chained filters: {:.3f} s, peak {:.1f} MB'.format(t_chain, peak_chain / 1e6))
+    print('Fused mask:      {:.3f} s, peak {:.1f} MB'.format(t_fused, peak_fused / 1e6))
@@ -9,24 +9,34 @@ import matplotlib.cm as cm
 import numpy as np
 import pandas as pd
 
-from compare_rcmip import subset_years, trim_axs
+from compare_rcmip import align_outputs, group_variables, trim_axs
+from compare_versions import read_output
+from render import finish_figure
 
-def plot_em_diff(default_df, rcmip_df, vars, years=(1750, 2100), scenario='RCP45'):
+def plot_em_diff(aligned, vars, years=(1750, 2100), scenario='RCP45',
+                 out_dir=None, fmt='pdf'):
     """
     Plot the difference between RCMIP & default Hector concentrations for various species
     
     Parameters
     -----------
-    default_df : Pandas DataFrame
-        Default Hector emissions data
-    rcmip_df : Pandas DataFrame
-        RCMIP Hector emissions data
+    aligned : Pandas DataFrame
+        Default & RCMIP Hector output of one scenario, aligned by align_outputs
     vars : list of str
         Variables to plot
     years : tuple of (int, int)
         Years that define variable timeseries
     scenario : str
         Emissions scenario
+    out_dir : str, optional
+        If given, save the figure to this directory instead of showing it
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'pdf'
+        
+    Return
+    ------
+    str or None
+        Path of the saved figure, if it was saved
     """
     plt.style.use('ggplot')
     figsize = (10, 8)
@@ -35,27 +45,21 @@ def plot_em_diff(default_df, rcmip_df, vars, years=(1750, 2100), scenario='RCP45
     fig, axs = plt.subplots(rows, cols, figsize=figsize, dpi=150, constrained_layout=True)
     fig.suptitle('Hector Output - RCMIP Minus Default Concentrations', fontsize=16)
     axs = trim_axs(axs, len(vars))
-    x = np.asarray([x for x in range(years[0], years[1] + 1)])
-    default_df = subset_years(default_df, years)
-    rcmip_df   = subset_years(rcmip_df, years)
+    var_dfs = group_variables(aligned, years=years)
     for ax, var in zip(axs, vars):
         ax.set_title(var)
+        if (var not in var_dfs):
+            continue
         print('Plotting {}...'.format(var))
-        # Plot default variable value
-        var_df = default_df.loc[default_df['variable'] == var]
-        units  = var_df['units'].unique().tolist()[0]
-        y_default = np.asarray(default_df.loc[default_df['variable'] == var]['value'])
-        y_rcmip   = np.asarray(rcmip_df.loc[rcmip_df['variable'] == var]['value'])
-        diff = np.subtract(y_rcmip, y_default)
-        ax.plot(x, diff, c='r', ls='-', lw=1, label='Diff')
-        ax.set_ylabel('{}'.format(units))
+        var_df = var_dfs[var]
+        ax.plot(var_df['year'].to_numpy(), var_df['diff'].to_numpy(), c='r', ls='-',
+                lw=1, label='Diff')
+        ax.set_ylabel('{}'.format(var_df['units'].iloc[0]))
         ax.set_xticks([1750, 1850, 1950, 2050, 2150])
         ax.set_xlim(1750, 2100)
      # End vars loop
-    f_name = 'emission-comparison-{}.pdf'.format(scenario)
-    figManager = plt.get_current_fig_manager()
-    figManager.window.showMaximized()
-    plt.show()
+    f_name = 'concentration-diff-{}.pdf'.format(scenario)
+    return finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt)
 # ------------------------------------------------------------------------------
 
 if __name__ == '__main__':  
@@ -63,13 +67,13 @@ if __name__ == '__main__':
     outpath_rcmip   = r"C:\Users\nich980\data\hector\version-comparison\rcp45-default-rcmip.csv"
 
     # Read both output files and extract a list of variables in each
-    df_default = pd.read_csv(outpath_default, sep=',', header=0)
-    df_rcmip   = pd.read_csv(outpath_rcmip, sep=',', header=0)
+    df_default = read_output(outpath_default)
+    df_rcmip   = read_output(outpath_rcmip)
 
-    default_vars = df_default['variable'].unique().tolist()
-    rcmip_vars   = df_rcmip['variable'].unique().tolist()
+    # Align both outputs once; the plotting function reads the aligned frame
+    aligned = align_outputs(df_default, df_rcmip, scenario='RCP45')
 
-    vars = [x for x in rcmip_vars if x in default_vars]
+    vars = aligned['variable'].cat.categories.tolist()
 
-    plot_em_diff(df_default, df_rcmip, vars)
+    plot_em_diff(aligned, vars)
     
\ No newline at end of file
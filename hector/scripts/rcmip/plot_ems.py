@@ -9,10 +9,39 @@ import matplotlib.cm as cm
 import numpy as np
 import pandas as pd
 from cfunits import Units
+from functools import lru_cache
 
 from compare_rcmip import subset_years, trim_axs
+from rcmip_emissions import RCMIPEmissions
+from render import finish_figure
+from variable_map import VariableMap
 
 # === Helper Functions =========================================================
+@lru_cache(maxsize=256)
+def conversion_factors(input_unit, output_unit):
+    """
+    Resolve a pair of udunits strings to the affine conversion between them,
+    output = input * scale + offset. Each pair is only parsed once
+    
+    Params
+    -------
+    input_unit : str
+        Unit to convert from
+    output_unit : str
+        Unit to convert to
+    
+    Return
+    -------
+    tuple of (float, float)
+        Scale & offset
+    """
+    if (input_unit == output_unit):
+        return (1.0, 0.0)
+    # Two points pin down the affine conversion
+    conv = Units.conform(np.array([0.0, 1.0]), Units(input_unit), Units(output_unit))
+    return (float(conv[1] - conv[0]), float(conv[0]))
+
+
 def convert_units(input_vals, input_unit, output_unit):
     """
     Convert the units of an array of values
@@ -30,10 +59,95 @@ def convert_units(input_vals, input_unit, output_unit):
     -------
     Numpy array
     """
-    conv_vals = Units.conform(input_vals, Units(input_unit), Units(output_unit))
+    scale, offset = conversion_factors(input_unit, output_unit)
+    conv_vals = np.asarray(input_vals, dtype=float) * scale + offset
     return conv_vals
     
     
+def conversion_table(var_lut):
+    """
+    Resolve the unit conversion of every row of the RCMIP to Hector variable
+    look up table ahead of time
+    
+    Params
+    -------
+    var_lut : Pandas DataFrame or VariableMap
+        RCMIP to Hector variable look up table, Ex: variable-conversion.csv
+        
+    Return
+    -------
+    Pandas DataFrame
+        Columns: rcmip_variable, hector_variable, scale, offset
+    """
+    if (isinstance(var_lut, VariableMap)):
+        var_lut = var_lut.to_frame()
+    factors = [conversion_factors(in_unit, out_unit) for in_unit, out_unit in
+               zip(var_lut['rcmip_udunits'], var_lut['hector_udunits'])]
+    table = var_lut[['rcmip_variable', 'hector_variable']].copy()
+    table['scale']  = [f[0] for f in factors]
+    table['offset'] = [f[1] for f in factors]
+    return table.reset_index(drop=True)
+    
+    
+def convert_rcmip(rcmip_df, conv_table):
+    """
+    Convert long-format RCMIP emissions of any number of scenarios & variables
+    to Hector units with a single multiply-add
+    
+    Params
+    -------
+    rcmip_df : Pandas DataFrame
+        Long-format RCMIP emissions. Must have 'Variable' & 'Value' columns
+    conv_table : Pandas DataFrame
+        Conversion table returned by conversion_table
+        
+    Return
+    -------
+    Pandas DataFrame
+        rcmip_df with a 'hector_variable' column & 'Value' in Hector units.
+        RCMIP rows mapped to more than one Hector variable appear once per
+        Hector variable. Rows of RCMIP variables not in the table are dropped
+    """
+    conv_table = conv_table.drop_duplicates(['rcmip_variable', 'hector_variable'])
+    # One output row per (RCMIP row, mapping row) pair
+    hector_df = rcmip_df.merge(conv_table[['rcmip_variable', 'hector_variable', 'scale', 'offset']],
+                               how='inner', left_on=rcmip_df['Variable'].astype(str),
+                               right_on='rcmip_variable')
+    hector_df['Value'] = hector_df['Value'].to_numpy(dtype=float) * hector_df['scale'] + hector_df['offset']
+    return hector_df.drop(['rcmip_variable', 'scale', 'offset'], axis=1)
+    
+    
+def scenario_emissions(rcmip_df, conv_table, years=None):
+    """
+    Convert the RCMIP emissions of one scenario to a Hector emissions table
+
+    Params
+    ------
+    rcmip_df : Pandas DataFrame
+        Long-format, global RCMIP emissions of one scenario, Ex: from
+        RCMIPEmissions.load
+    conv_table : Pandas DataFrame
+        Unit conversion table returned by conversion_table
+    years : tuple of (int, int), optional
+        Only keep the years [year_min, year_max]
+
+    Return
+    ------
+    Pandas DataFrame
+        One row per year. Columns: 'Date' & one column per Hector variable.
+        Hector variables made up of several RCMIP variables are summed
+    """
+    hector_df = convert_rcmip(rcmip_df, conv_table)
+    if (years):
+        hector_df = hector_df[(hector_df['Year'] >= years[0]) & (hector_df['Year'] <= years[1])]
+    hector_df = hector_df.groupby(['Year', 'hector_variable'], sort=True)['Value'].sum(min_count=1)
+    hector_df = hector_df.unstack('hector_variable')
+    hector_vars = [var for var in conv_table['hector_variable'].unique() if var in hector_df.columns]
+    hector_df = hector_df[hector_vars].reset_index().rename(columns={'Year': 'Date'})
+    hector_df.columns.name = None
+    return hector_df
+    
+    
 def subset_rcmip_scenario(rcmip_df, scenario):
     """
     Get a subset of the master RCMIP input emissions dataframe for a specific
@@ -54,36 +168,6 @@ def subset_rcmip_scenario(rcmip_df, scenario):
     return scenario_df
     
 
-def rcmip_2_hector_var(rcmip_2_hector_lut, var_name):
-    """
-    Get the Hector variable name corresponding to a RCMIP variable name
-    
-    Params
-    -------
-    rcmip_2_hector_lut : Pandas DataFrame
-        RCMIP to Hector variable look up table
-    var_name : str
-        Name of the RCMIP variable
-        
-    Return
-    -------
-    Pandas Series representing RCMIP --> Hector variable conversion information
-        Attributes: hector_component, hector_variable, hector_unit, hector_udunits,
-                    rcmip_variable, rcmip_units, rcmip_udunits
-    """
-    # Get a Pandas series for the lut row. Use iloc[0] to handle case where a hector
-    # variable has multiple rows (ffi, luc)
-    if (var_name == 'ffi_emissions'):
-        rcmip_var = 'Emissions|CO2|MAGICC Fossil and Industrial'
-        var_row = rcmip_2_hector_lut.loc[rcmip_2_hector_lut['rcmip_variable'] == rcmip_var].iloc[0]
-    elif (var_name == 'luc_emissions'):
-        rcmip_var = 'Emissions|CO2|MAGICC AFOLU'
-        var_row = rcmip_2_hector_lut.loc[rcmip_2_hector_lut['rcmip_variable'] == rcmip_var].iloc[0]
-    else:
-        var_row = rcmip_2_hector_lut.loc[rcmip_2_hector_lut['hector_variable'] == var_name].iloc[0]
-    return var_row
-    
-    
 def wide_to_long(emissions_df):
     """
     Melt a dataframe from wide format to long format
@@ -123,7 +207,9 @@ def subset_em_years(emission_df, years, kywrd):
         col_name = 'Date'
     elif (kywrd == 'rcmip'):
         col_name = 'Year'
-        emission_df[col_name] = pd.to_numeric(emission_df[col_name])
+        if (not pd.api.types.is_integer_dtype(emission_df[col_name])):
+            # Only needed for frames not from rcmip_emissions, whose years are ints
+            emission_df[col_name] = pd.to_numeric(emission_df[col_name])
     else:
         raise ValueError('Invalid kywrd param; expected "hector" or "rcmip", got "{}"'.format(kywrd))
     ret_df = emission_df.loc[(emission_df[col_name] >= years[0]) &
@@ -132,7 +218,8 @@ def subset_em_years(emission_df, years, kywrd):
     
 # === Plotting funcs =========================================================== 
     
-def plot_emissions(default_df, rcmip_df, var_lut, vars, years=(1765, 2100), scenario='RCP45'):
+def plot_emissions(default_df, rcmip_df, var_lut, vars, years=(1765, 2100), scenario='RCP45',
+                   out_dir=None, fmt='pdf'):
     """
     Plot RCMIP & default Hector input emissions
     
@@ -141,15 +228,24 @@ def plot_emissions(default_df, rcmip_df, var_lut, vars, years=(1765, 2100), scen
     default_df : Pandas DataFrame
         Default Hector emissions data
     rcmip_df : Pandas DataFrame
-        RCMIP Hector emissions data
-    var_lut : Pandas DataFrame
-        RCMIP to Hector variable look up table
+        Long-format, global RCMIP emissions of the scenario
+    var_lut : VariableMap
+        RCMIP to Hector variable mapping
     vars : list of str
         Variables to plot
     years : tuple of (int, int)
         Years that define variable timeseries
     scenario : str
         Emissions scenario
+    out_dir : str, optional
+        If given, save the figure to this directory instead of showing it
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'pdf'
+        
+    Return
+    ------
+    str or None
+        Path of the saved figure, if it was saved
     """
     plt.style.use('ggplot')
     figsize = (10, 8)
@@ -161,22 +257,21 @@ def plot_emissions(default_df, rcmip_df, var_lut, vars, years=(1765, 2100), scen
     x = np.asarray([x for x in range(years[0], years[1] + 1)])
     yr_str = [str(yr) for yr in x]
     default_df = subset_em_years(default_df, years, 'hector')
-    rcmip_df   = subset_em_years(rcmip_df, years, 'rcmip')
+    # Same conversion as the Hector input files: RCMIP variables that make
+    # up a Hector variable are summed
+    rcmip_hector = scenario_emissions(rcmip_df, conversion_table(var_lut), years=years)
+    rcmip_hector = rcmip_hector.set_index('Date').reindex(x)
     for ax, var in zip(axs, vars):
         ax.set_title(var)
         print('Plotting {}...'.format(var))
-        # --- Get Hector <==> RCMIP variable conversion info ---
-        var_conv = rcmip_2_hector_var(var_lut, var)
         # --- Plot default variable value ----------------------
         var_df = default_df[var]
-        units  = var_conv.hector_unit
+        units  = var_lut.by_hector(var).hector_unit
         y = var_df.values
         ax.plot(x, y, c='g', ls='-', lw=1, label='Default')
         ax.set_ylabel('{}'.format(units))
-        # --- Convert & plot RCMIP variable value ------------------------
-        var_df = rcmip_df.loc[rcmip_df['Variable'] == var_conv.rcmip_variable]
-        rcmip_vals = var_df['Value'].to_numpy()
-        y = convert_units(rcmip_vals, var_conv.rcmip_udunits, var_conv.hector_udunits)
+        # --- Plot converted RCMIP variable value ------------------------
+        y = rcmip_hector[var].values if var in rcmip_hector.columns else np.full(len(x), np.nan)
         ax.plot(x, y, c='r', ls='-', lw=1, label='RCMIP')
         ax.set_xticks([1750, 1850, 1950, 2050, 2150, 2250])
         ax.set_xlim(years[0], years[1])
@@ -186,9 +281,8 @@ def plot_emissions(default_df, rcmip_df, var_lut, vars, years=(1765, 2100), scen
                      ncol=2, title='Hector Input Emissions')
     for legobj in leg.legendHandles:
         legobj.set_linewidth(3.0)
-    figManager = plt.get_current_fig_manager()
-    figManager.window.showMaximized()
-    plt.show()
+    f_name = 'input-emissions-{}.pdf'.format(scenario)
+    return finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt)
 # ------------------------------------------------------------------------------
 
 if __name__ == '__main__':
@@ -200,11 +294,10 @@ if __name__ == '__main__':
     # Default Hector emissions are already in long-format
     df_default = pd.read_csv(path_default, sep=',', skiprows=3, header=0)
     
-    df_rcmip = pd.read_csv(path_rcmip, sep=',', header=0)
-    df_rcmip = wide_to_long(df_rcmip)
-    df_rcmip = subset_rcmip_scenario(df_rcmip, 'rcp45')
+    # Only the rcp45 partition is melted & read
+    df_rcmip = RCMIPEmissions(path_rcmip).load('rcp45')
     
-    rcmip_hector_lut = pd.read_csv(lut_path, sep=',', header=0, skipinitialspace=True)
+    rcmip_hector_lut = VariableMap.from_csv(lut_path)
     
     vars = ['BC_emissions', 'CH4_emissions', 'CO_emissions', 'ffi_emissions',
             'luc_emissions', 'N2O_emissions', 'NMVOC_emissions',
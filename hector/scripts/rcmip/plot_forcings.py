@@ -10,24 +10,34 @@ import matplotlib.cm as cm
 import numpy as np
 import pandas as pd
 
-from compare_rcmip import subset_years, trim_axs
+from compare_rcmip import align_outputs, group_variables, trim_axs
+from compare_versions import read_output
+from render import finish_figure
 
-def plot_forcings(default_df, rcmip_df, vars, years=(1750, 2100), scenario='RCP45'):
+def plot_forcings(aligned, vars, years=(1750, 2100), scenario='RCP45',
+                  out_dir=None, fmt='pdf'):
     """
     Plot RCMIP & default Hector forcings
     
     Parameters
     -----------
-    default_df : Pandas DataFrame
-        Default Hector emissions data
-    rcmip_df : Pandas DataFrame
-        RCMIP Hector emissions data
+    aligned : Pandas DataFrame
+        Default & RCMIP Hector output of one scenario, aligned by align_outputs
     vars : list of str
         Variables to plot
     years : tuple of (int, int)
         Years that define variable timeseries
     scenario : str
         Emissions scenario
+    out_dir : str, optional
+        If given, save the figure to this directory instead of showing it
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'pdf'
+        
+    Return
+    ------
+    str or None
+        Path of the saved figure, if it was saved
     """
     plt.style.use('ggplot')
     figsize = (10, 8)
@@ -36,23 +46,19 @@ def plot_forcings(default_df, rcmip_df, vars, years=(1750, 2100), scenario='RCP4
     fig, axs = plt.subplots(rows, cols, figsize=figsize, dpi=150, constrained_layout=True)
     fig.suptitle('Hector Output - RCMIP vs. Default Forcings', fontsize=16)
     axs = trim_axs(axs, len(vars))
-    x = np.asarray([x for x in range(years[0], years[1] + 1)])
-    default_df = subset_years(default_df, years)
-    rcmip_df   = subset_years(rcmip_df, years)
+    var_dfs = group_variables(aligned, years=years)
     for ax, var in zip(axs, vars):
         ax.set_title(var)
+        if (var not in var_dfs):
+            continue
         print('Plotting {}...'.format(var))
+        var_df = var_dfs[var]
+        x = var_df['year'].to_numpy()
         # Plot default variable value
-        var_df = default_df.loc[default_df['variable'] == var]
-        units  = var_df['units'].unique().tolist()[0]
-        y = np.asarray(var_df['value'])
-        ax.plot(x, y, c='g', ls='-', lw=1, label='Default')
-        ax.set_ylabel('{}'.format(units))
+        ax.plot(x, var_df['default'].to_numpy(), c='g', ls='-', lw=1, label='Default')
+        ax.set_ylabel('{}'.format(var_df['units'].iloc[0]))
         # Plot RCMIP variable value
-        var_df = rcmip_df.loc[rcmip_df['variable'] == var]
-        units  = var_df['units'].unique().tolist()[0]
-        y = np.asarray(var_df['value'])
-        ax.plot(x, y, c='r', ls='-', lw=1, label='RCMIP')
+        ax.plot(x, var_df['rcmip'].to_numpy(), c='r', ls='-', lw=1, label='RCMIP')
         ax.set_xticks([1750, 1850, 1950, 2050, 2150, 2250])
         ax.set_xlim(1750, 2100)
      # End vars loop
@@ -61,10 +67,8 @@ def plot_forcings(default_df, rcmip_df, vars, years=(1750, 2100), scenario='RCP4
                      ncol=2, title='Hector Forcings')
     for legobj in leg.legendHandles:
         legobj.set_linewidth(3.0)
-    # f_name = 'emission-comparison-{}.pdf'.format(scenario)
-    figManager = plt.get_current_fig_manager()
-    figManager.window.showMaximized()
-    plt.show()
+    f_name = 'forcing-comparison-{}.pdf'.format(scenario)
+    return finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt)
 # ------------------------------------------------------------------------------
 
 if __name__ == '__main__':  
@@ -72,10 +76,12 @@ if __name__ == '__main__':
     outpath_rcmip   = r"C:\Users\nich980\data\hector\version-comparison\rcp45-default-rcmip.csv"
 
     # Read both output files and extract a list of variables in each
-    df_default = pd.read_csv(outpath_default, sep=',', header=0)
-    df_rcmip   = pd.read_csv(outpath_rcmip, sep=',', header=0)
+    df_default = read_output(outpath_default)
+    df_rcmip   = read_output(outpath_rcmip)
 
     vars = ['Ftot', 'FCO2', 'FN2O', 'FBC', 'FOC', 'FSO2', 'FCH4']
 
-    plot_forcings(df_default, df_rcmip, vars)
+    aligned = align_outputs(df_default, df_rcmip, vars=vars, scenario='RCP45')
+
+    plot_forcings(aligned, vars)
     
\ No newline at end of file
@@ -9,6 +9,11 @@ import matplotlib.cm as cm
 import numpy as np
 import pandas as pd
 
+from compare_rcmip import trim_axs
+from frame_query import Query
+from rcmip_emissions import RCMIPEmissions
+from render import finish_figure
+
 
 # === Helper funcs =============================================================
 def wide_to_long(emissions_df):
@@ -69,7 +74,9 @@ def subset_em_years(emission_df, years, kywrd):
         col_name = 'Date'
     elif (kywrd == 'rcmip'):
         col_name = 'Year'
-        emission_df[col_name] = pd.to_numeric(emission_df[col_name])
+        if (not pd.api.types.is_integer_dtype(emission_df[col_name])):
+            # Only needed for frames not from rcmip_emissions, whose years are ints
+            emission_df[col_name] = pd.to_numeric(emission_df[col_name])
     else:
         raise ValueError('Invalid kywrd param; expected "hector" or "rcmip", got "{}"'.format(kywrd))
     ret_df = emission_df.loc[(emission_df[col_name] >= years[0]) &
@@ -77,77 +84,124 @@ def subset_em_years(emission_df, years, kywrd):
     return ret_df
     
     
-# === Plotting func ============================================================
+# === Plotting funcs ===========================================================
 
-def plot_rcmip_ems(rcmip_ems, years=(1765, 2100)):
+def em_variable(species):
     """
-    Plot RCMIP input emissions for some SSPs & RCPs. Currently only plotting
-    N2O emissions
-    
-    Scenarios:
-        RCP45, RCP60, SSP119, SSP370
+    Get the RCMIP variable name of an emission species, Ex: 'N2O' --> 'Emissions|N2O'
+    """
+    if (species.startswith('Emissions|')):
+        return species
+    return 'Emissions|{}'.format(species)
+
+def plot_rcmip_grid(rcmip_ems, species, scenarios, years=(1765, 2100), title=None,
+                    f_name='rcmip-emissions-grid.pdf', out_dir=None, fmt='pdf'):
+    """
+    Plot RCMIP input emissions of any species & scenarios on a facet grid, one
+    panel per species with one line per scenario. Every series is taken from
+    a single groupby over the selected rows
     
     Params
     -------
     rcmip_ems : Pandas DataFrame
-        RCMIP emissions data
+        RCMIP emissions data, wide-format or long-format (Ex: from
+        RCMIPEmissions.load)
+    species : list of str
+        Emission species or RCMIP variables, Ex: ['N2O', 'Emissions|CH4']
+    scenarios : list of str
+        RCMIP scenarios, Ex: ['rcp45', 'ssp370']
     years : tuple of (int, int)
         Years that define variable timeseries
+    title : str, optional
+        Figure title. Default is 'RCMIP Input Emissions'
+    f_name : str, optional
+        Name of the output file
+    out_dir : str, optional
+        If given, save the figure to this directory instead of showing it
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'pdf'
+        
+    Return
+    ------
+    str or None
+        Path of the saved figure, if it was saved
     """
-    rcmip_ems = wide_to_long(rcmip_ems)
-    scenarios = ['rcp60', 'rcp45', 'ssp119', 'ssp370']
+    if ('Year' not in rcmip_ems.columns):
+        rcmip_ems = wide_to_long(rcmip_ems)
+    variables = [em_variable(x) for x in species]
+    # --- Select every series at once, then split them with one groupby ---
+    em_df = Query(rcmip_ems).region('World').scenario(*scenarios).variable(*variables)
+    em_df = em_df.years(*years).collect()
+    if (not pd.api.types.is_integer_dtype(em_df['Year'])):
+        em_df = em_df.assign(Year=pd.to_numeric(em_df['Year']))
+    series = {}
+    for (scenario, var), var_df in em_df.groupby(['Scenario', 'Variable'], sort=False,
+                                                 observed=True):
+        series[(scenario, var)] = (var_df['Year'].to_numpy(), var_df['Value'].to_numpy(),
+                                   var_df['Unit'].iloc[0])
     plt.style.use('ggplot')
-    figsize = (10, 8)
-    fig, ax = plt.subplots()
-    plt.title('RCMIP N2O Emissions', fontsize=16)
-    x = np.asarray([x for x in range(years[0], years[1] + 1)])
-    # --- Subset the rcmip emissions df for scenario & years ---
-    em_rcp45  = subset_rcmip_scenario(rcmip_ems, 'rcp45')
-    em_rcp45  = subset_em_years(em_rcp45, years, 'rcmip')
-    em_rcp60  = subset_rcmip_scenario(rcmip_ems, 'rcp60')
-    em_rcp60  = subset_em_years(em_rcp60, years, 'rcmip')
-    em_ssp119 = subset_rcmip_scenario(rcmip_ems, 'ssp119')
-    em_ssp119 = subset_em_years(em_ssp119, years, 'rcmip')
-    em_ssp370 = subset_rcmip_scenario(rcmip_ems, 'ssp370')
-    em_ssp370 = subset_em_years(em_ssp370, years, 'rcmip')
-    # --- Plot rcp45 -------------------------------------------
-    var_df = em_rcp45.loc[em_rcp45['Variable'] == 'Emissions|N2O']
-    em_vals = var_df['Value'].to_numpy()
-    ax.plot(x, em_vals, c='r', ls='-', lw=1, label='RCP45')
-    # --- Plot rcp60 -------------------------------------------
-    var_df = em_rcp60.loc[em_rcp60['Variable'] == 'Emissions|N2O']
-    em_vals = var_df['Value'].to_numpy()
-    ax.plot(x, em_vals, c='g', ls='--', lw=1, label='RCP60')
-    # --- Plot ssp119 ------------------------------------------
-    var_df = em_ssp119.loc[em_ssp119['Variable'] == 'Emissions|N2O']
-    em_vals = var_df['Value'].to_numpy()
-    ax.plot(x, em_vals, c='b', ls='-', lw=1, label='SSP119')
-    # --- Plot ssp370 ------------------------------------------
-    var_df = em_ssp370.loc[em_ssp370['Variable'] == 'Emissions|N2O']
-    em_vals = var_df['Value'].to_numpy()
-    ax.plot(x, em_vals, c='m', ls='--', lw=1, label='SSP370')
-    unit = var_df['Unit'].iloc[0]
-    ax.set_ylabel('N2O Emissions ({})'.format(unit))
-    ax.set_xlabel('Year')
-    # --- Axis ticks & labels ----------------------------------
-    # ax.set_xticks([1750, 1850, 1950, 2050, 2150, 2250])
-    ax.set_xticks([1800, 1825, 1850, 1875, 1900, 1925, 1950])
-    ax.set_xlim(years[0], years[1])
-    handles, labels = ax.get_legend_handles_labels()
-    leg = fig.legend(handles, labels, loc=4, bbox_to_anchor=(0.9,0.17), prop={'size': 8}, 
-                     ncol=2, title='RCMIP Input Emissions')
+    cols = min(4, len(variables))
+    rows = int(np.ceil(len(variables) / cols))
+    fig, axs = plt.subplots(rows, cols, figsize=(10, 8), squeeze=False, constrained_layout=True)
+    fig.suptitle(title if title else 'RCMIP Input Emissions', fontsize=16)
+    axs = trim_axs(axs, len(variables))
+    colors = cm.tab10(np.linspace(0, 1, 10))
+    for ax, var in zip(axs, variables):
+        ax.set_title(var.replace('Emissions|', ''))
+        for scn_idx, scenario in enumerate(scenarios):
+            if ((scenario, var) not in series):
+                continue
+            x, y, unit = series[(scenario, var)]
+            ax.plot(x, y, c=colors[scn_idx % 10], ls='-', lw=1, label=scenario.upper())
+            ax.set_ylabel(unit)
+        ax.set_xlim(years[0], years[1])
+    handles, labels = [], []
+    for ax in axs:
+        for handle, label in zip(*ax.get_legend_handles_labels()):
+            if (label not in labels):
+                handles.append(handle)
+                labels.append(label)
+    leg = fig.legend(handles, labels, loc=4, prop={'size': 8}, ncol=2,
+                     title='RCMIP Input Emissions')
     for legobj in leg.legendHandles:
         legobj.set_linewidth(3.0)
-    figManager = plt.get_current_fig_manager()
-    figManager.window.showMaximized()
-    plt.show()
+    return finish_figure(fig, f_name, out_dir=out_dir, fmt=fmt)
+
+def plot_rcmip_ems(rcmip_ems, years=(1765, 2100), out_dir=None, fmt='pdf'):
+    """
+    Plot RCMIP N2O input emissions for some SSPs & RCPs
+    
+    Scenarios:
+        RCP45, RCP60, SSP119, SSP370
+    
+    Params
+    -------
+    rcmip_ems : Pandas DataFrame
+        RCMIP emissions data, wide-format or long-format (Ex: from
+        RCMIPEmissions.load)
+    years : tuple of (int, int)
+        Years that define variable timeseries
+    out_dir : str, optional
+        If given, save the figure to this directory instead of showing it
+    fmt : str, optional
+        Output file format used when out_dir is given. Default is 'pdf'
+        
+    Return
+    ------
+    str or None
+        Path of the saved figure, if it was saved
+    """
+    return plot_rcmip_grid(rcmip_ems, ['N2O'], ['rcp45', 'rcp60', 'ssp119', 'ssp370'],
+                           years=years, title='RCMIP N2O Emissions',
+                           f_name='rcmip-n2o-emissions.pdf', out_dir=out_dir, fmt=fmt)
     
 # ------------------------------------------------------------------------------
     
 if __name__ == '__main__':
     path_rcmip   = r"C:\Users\nich980\code\hector-rcmip\data-raw\rcmip-emissions-annual-means-v3-1-0.csv"
-    df_rcmip = pd.read_csv(path_rcmip, sep=',', header=0)
-    
     years = (1850, 1950)
+    df_rcmip = RCMIPEmissions(path_rcmip).load(['rcp60', 'rcp45', 'ssp119', 'ssp370'],
+                                               variables='Emissions|N2O', years=years)
+    
     plot_rcmip_ems(df_rcmip, years=years)
     
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+Matt Nicholson
+19 Oct 2026
+
+Loader for the wide-format RCMIP input emissions file,
+rcmip-emissions-annual-means-v3-1-0.csv. Scenario, region, & variable filters
+are applied to the wide file before it is melted, years are converted to
+integers once, and the melted emissions are cached on disk with one partition
+per scenario, so that loading a scenario only reads that scenario's partition.
+"""
+import pickle
+import re
+import numpy as np
+import pandas as pd
+
+from os import makedirs, replace, stat
+from os.path import join, exists
+
+# Identifier columns of the wide RCMIP emissions file. Every other column is a year
+id_cols = ["Model", "Scenario", "Region", "Variable", "Unit", "Activity_Id", "Mip_Era"]
+
+def _isin(series, values):
+    if (isinstance(values, str)):
+        values = [values]
+    return series.isin(values).to_numpy()
+
+def read_wide(path, scenarios=None, regions=None, variables=None, chunksize=2000):
+    """
+    Read the wide RCMIP emissions file, keeping only the requested rows
+
+    Params
+    ------
+    path : str
+        Path of the RCMIP emissions file
+    scenarios, regions, variables : str or list of str, optional
+        Only keep these scenarios, regions, & variables. Default is to keep all
+
+    Return
+    ------
+    Pandas DataFrame
+    """
+    frames = []
+    for chunk in pd.read_csv(path, sep=',', header=0, chunksize=chunksize):
+        mask = np.ones(len(chunk), dtype=bool)
+        if (scenarios):
+            mask &= _isin(chunk['Scenario'], scenarios)
+        if (regions):
+            mask &= _isin(chunk['Region'], regions)
+        if (variables):
+            mask &= _isin(chunk['Variable'], variables)
+        frames.append(chunk[mask])
+    return pd.concat(frames, ignore_index=True)
+
+def melt_wide(wide_df):
+    """
+    Melt wide RCMIP emissions to long format. Each row's years are kept
+    contiguous & in order
+
+    Params
+    ------
+    wide_df : Pandas DataFrame
+        Wide-format RCMIP emissions, Ex: returned by read_wide
+
+    Return
+    ------
+    Pandas DataFrame
+        Columns: id_cols, 'Year' (int16), & 'Value' (float64). Identifier
+        columns are categorical
+    """
+    year_cols = [col for col in wide_df.columns if col not in id_cols]
+    years = np.array([int(col) for col in year_cols], dtype=np.int16)
+    n_years = len(year_cols)
+    long_df = pd.DataFrame({col: pd.Categorical(np.repeat(wide_df[col].to_numpy(), n_years))
+                            for col in id_cols})
+    long_df['Year']  = np.tile(years, len(wide_df))
+    long_df['Value'] = wide_df[year_cols].to_numpy(dtype=float).ravel()
+    return long_df
+
+def _filter(long_df, regions=None, variables=None, years=None):
+    mask = np.ones(len(long_df), dtype=bool)
+    if (regions):
+        mask &= _isin(long_df['Region'], regions)
+    if (variables):
+        mask &= _isin(long_df['Variable'], variables)
+    if (years):
+        mask &= ((long_df['Year'] >= years[0]) & (long_df['Year'] <= years[1])).to_numpy()
+    if (mask.all()):
+        return long_df
+    return long_df[mask].reset_index(drop=True)
+
+class RCMIPEmissions:
+    """
+    RCMIP input emissions, cached in long format with one partition per
+    scenario
+    """
+
+    def __init__(self, path, cache_dir=None):
+        """
+        Constructor for the RCMIPEmissions class
+
+        Params
+        ------
+        path : str
+            Path of the wide RCMIP emissions file
+        cache_dir : str, optional
+            Directory to hold the scenario partitions. Default is
+            '<path>.cache'. Partitions are rebuilt when the emissions file's
+            modification time or size changes
+        """
+        self.path      = path
+        self.cache_dir = cache_dir if cache_dir else path + '.cache'
+        f_stat = stat(path)
+        self._key = (f_stat.st_mtime, f_stat.st_size)
+
+    def _partition_path(self, scenario):
+        return join(self.cache_dir, '{}.pkl'.format(re.sub(r'[^\w.-]', '_', scenario)))
+
+    def _read_partition(self, scenario):
+        """
+        Read a scenario partition
+
+        Return
+        ------
+        Pandas DataFrame, or None if the partition is missing or stale
+        """
+        part_path = self._partition_path(scenario)
+        if (not exists(part_path)):
+            return None
+        with open(part_path, 'rb') as f_in:
+            key, long_df = pickle.load(f_in)
+        if (key != self._key):
+            return None
+        return long_df
+
+    def build(self, scenarios=None):
+        """
+        Melt the given scenarios, or every scenario, & write their partitions
+        with a single pass over the emissions file
+
+        Return
+        ------
+        dict of {str: Pandas DataFrame}
+            Long-format emissions of each scenario
+        """
+        long_df = melt_wide(read_wide(self.path, scenarios=scenarios))
+        if (scenarios is None):
+            scenarios = long_df['Scenario'].cat.categories.tolist()
+        makedirs(self.cache_dir, exist_ok=True)
+        grouped = dict(tuple(long_df.groupby('Scenario', sort=False, observed=True)))
+        partitions = {}
+        for scenario in scenarios:
+            # Scenarios missing from the file get an empty partition
+            scn_df = grouped.get(scenario, long_df.iloc[:0])
+            scn_df = scn_df.reset_index(drop=True)
+            for col in id_cols:
+                scn_df[col] = scn_df[col].cat.remove_unused_categories()
+            part_path = self._partition_path(scenario)
+            with open(part_path + '.tmp', 'wb') as f_out:
+                pickle.dump((self._key, scn_df), f_out, protocol=pickle.HIGHEST_PROTOCOL)
+            replace(part_path + '.tmp', part_path)
+            partitions[scenario] = scn_df
+        return partitions
+
+    def load(self, scenarios, regions=('World',), variables=None, years=None):
+        """
+        Load long-format emissions. Scenarios that are not cached yet are
+        read from the emissions file in one pass & cached
+
+        Params
+        ------
+        scenarios : str or list of str
+            Scenarios to load, Ex: 'rcp45'
+        regions : str or list of str, optional
+            Regions to keep. Default is 'World'. None keeps every region
+        variables : str or list of str, optional
+            Variables to keep. Default is every variable
+        years : tuple of (int, int), optional
+            Only keep the years [year_min, year_max]
+
+        Return
+        ------
+        Pandas DataFrame
+            Columns: id_cols, 'Year' (int16), & 'Value'
+        """
+        if (isinstance(scenarios, str)):
+            scenarios = [scenarios]
+        partitions = {scn: self._read_partition(scn) for scn in scenarios}
+        missing = [scn for scn, part in partitions.items() if part is None]
+        if (missing):
+            partitions.update(self.build(missing))
+        frames = [_filter(partitions[scn], regions=regions, variables=variables, years=years)
+                  for scn in scenarios]
+        if (len(frames) == 1):
+            return frames[0]
+        long_df = pd.concat(frames, ignore_index=True)
+        for col in id_cols:
+            long_df[col] = long_df[col].astype('category')
+        return long_df
+
+def read_rcmip(path, scenarios=None, regions=None, variables=None, years=None):
+    """
+    Read long-format RCMIP emissions without the cache. Every filter is
+    applied to the wide file before it is melted
+
+    Params
+    ------
+    path : str
+        Path of the wide RCMIP emissions file
+    scenarios, regions, variables : str or list of str, optional
+        Only keep these scenarios, regions, & variables. Default is to keep all
+    years : tuple of (int, int), optional
+        Only keep the years [year_min, year_max]
+
+    Return
+    ------
+    Pandas DataFrame
+    """
+    wide_df = read_wide(path, scenarios=scenarios, regions=regions, variables=variables)
+    return _filter(melt_wide(wide_df), years=years)
@@ -0,0 +1,324 @@
+"""
+Matt Nicholson
+19 Oct 2026
+
+Helpers to finish a figure either interactively or by saving it to a file,
+and to render many independent figures headlessly in a process pool. Rendered
+figures are cached by a hash of their input data & plot parameters, so
+figures whose inputs have not changed are not re-rendered
+"""
+import hashlib
+import inspect
+import json
+import sys
+import time
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import makedirs, replace
+from os.path import join, splitext, isfile
+
+
+def finish_figure(fig, f_name, out_dir=None, fmt=None):
+    """
+    Show a figure maximized or, if an output directory is given, save it to
+    a file and close it
+
+    Params
+    ------
+    fig : Matplotlib Figure
+    f_name : str
+        Name of the output file. The extension is replaced if fmt is given
+    out_dir : str, optional
+        Directory to save the figure to. Default is to show the figure
+    fmt : str, optional
+        Output file format, Ex: 'pdf' or 'png'
+
+    Return
+    ------
+    str or None
+        Path of the saved figure, if it was saved
+    """
+    if (not out_dir):
+        figManager = plt.get_current_fig_manager()
+        figManager.window.showMaximized()
+        plt.show()
+        return None
+    if (fmt):
+        f_name = '{}.{}'.format(splitext(f_name)[0], fmt)
+    out_path = join(out_dir, f_name)
+    fig.savefig(out_path)
+    plt.close(fig)
+    return out_path
+
+
+# ================================ Render Cache ================================
+
+def _update_hash(h, obj):
+    """
+    Recursively add an object to a hashlib hash. Objects that define a
+    cache_key() method are hashed by the value it returns
+    """
+    h.update(type(obj).__name__.encode())
+    if (hasattr(obj, 'cache_key')):
+        _update_hash(h, obj.cache_key())
+    elif (isinstance(obj, pd.DataFrame)):
+        h.update(repr(obj.columns.tolist()).encode())
+        h.update(repr(obj.dtypes.astype(str).tolist()).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif (isinstance(obj, pd.Series)):
+        h.update(repr((obj.name, str(obj.dtype))).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif (isinstance(obj, np.ndarray)):
+        h.update(repr((str(obj.dtype), obj.shape)).encode())
+        if (obj.dtype == object):
+            h.update(repr(obj.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif (isinstance(obj, dict)):
+        # Insertion order is kept; it can change the figure (Ex: line colors)
+        for key, val in obj.items():
+            _update_hash(h, key)
+            _update_hash(h, val)
+    elif (isinstance(obj, (list, tuple))):
+        for val in obj:
+            _update_hash(h, val)
+        h.update(b'end')
+    elif (callable(obj)):
+        # Re-render when the plotting code changes
+        try:
+            h.update(inspect.getsource(obj).encode())
+        except (OSError, TypeError):
+            h.update(getattr(obj, '__qualname__', repr(obj)).encode())
+    else:
+        h.update(repr(obj).encode())
+
+
+def _is_local(module):
+    """
+    Check whether a module is one of our scripts rather than part of Python
+    or an installed package
+    """
+    f_path = getattr(module, '__file__', None)
+    if (not f_path or 'site-packages' in f_path or 'dist-packages' in f_path):
+        return False
+    return not f_path.startswith((sys.prefix, sys.base_prefix))
+
+
+def code_modules(func):
+    """
+    Get the module of a plotting function & every local module it depends
+    on, Ex: the modules of helper functions it imports, followed transitively
+
+    Return
+    ------
+    list of module
+        Sorted by module name
+    """
+    found = {}
+    todo = [sys.modules.get(getattr(func, '__module__', None))]
+    while (todo):
+        module = todo.pop()
+        if (module is None or module.__name__ in found or not _is_local(module)):
+            continue
+        found[module.__name__] = module
+        for obj in list(vars(module).values()):
+            if (inspect.ismodule(obj)):
+                todo.append(obj)
+            elif (inspect.isfunction(obj) or inspect.isclass(obj)):
+                todo.append(sys.modules.get(obj.__module__))
+    return [found[name] for name in sorted(found)]
+
+
+def hash_inputs(func, args, kwargs):
+    """
+    Hash a plotting function, the data it is given, & its plot parameters.
+    The source of every local module the function depends on is hashed too,
+    so that changes to helper functions re-render the figure
+
+    Return
+    ------
+    str
+        Hex digest
+    """
+    h = hashlib.sha1()
+    _update_hash(h, func)
+    for module in code_modules(func):
+        try:
+            h.update(inspect.getsource(module).encode())
+        except (OSError, TypeError):
+            h.update(module.__name__.encode())
+    _update_hash(h, args)
+    _update_hash(h, sorted(kwargs.items()))
+    return h.hexdigest()
+
+
+class RenderCache:
+    """
+    Manifest of the figures rendered to a directory & the hash of the inputs
+    each was rendered from
+    """
+
+    def __init__(self, out_dir, f_name='.render-cache.json'):
+        """
+        Constructor for the RenderCache class
+
+        Params
+        ------
+        out_dir : str
+            Directory the figures are rendered to
+        f_name : str, optional
+            Name of the manifest file in out_dir
+
+        Instance Attributes
+        --------------------
+        * hits : int
+            Number of figures found in the cache
+        * misses : int
+            Number of figures that had to be rendered
+        """
+        self.path     = join(out_dir, f_name)
+        self.manifest = {}
+        self.hits     = 0
+        self.misses   = 0
+        if (isfile(self.path)):
+            with open(self.path, 'r') as f_in:
+                self.manifest = json.load(f_in)
+
+    def lookup(self, digest):
+        """
+        Get the output of a previous render with the same input hash, if the
+        output files still exist
+
+        Return
+        ------
+        str, list of str, or None
+        """
+        out_path = self.manifest.get(digest)
+        paths = out_path if isinstance(out_path, list) else [out_path]
+        if (out_path and all(isfile(p) for p in paths)):
+            self.hits += 1
+            return out_path
+        self.misses += 1
+        return None
+
+    def add(self, digest, out_path):
+        """
+        Record a rendered figure. Entries for older renders of the same output
+        file are dropped
+        """
+        stale = [k for k, v in self.manifest.items() if v == out_path]
+        for k in stale:
+            del self.manifest[k]
+        self.manifest[digest] = out_path
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f_out:
+            json.dump(self.manifest, f_out, indent=1)
+        replace(tmp_path, self.path)
+
+    def report(self):
+        print('Render cache: {} hits, {} misses'.format(self.hits, self.misses))
+
+# ============================== Batch Rendering ===============================
+
+def _render_job(func, args, kwargs):
+    """
+    Render one figure in a worker process on the Agg backend
+
+    Return
+    ------
+    tuple of (str, float)
+        Path of the saved figure & render time in seconds
+    """
+    plt.switch_backend('Agg')
+    t_start = time.perf_counter()
+    out_path = func(*args, **kwargs)
+    return (out_path, time.perf_counter() - t_start)
+
+
+def _job_label(job):
+    """
+    Short description of a job's keyword args, to tell apart failed jobs of
+    the same plotting function
+    """
+    func, args, kwargs = job
+    labels = ['{}={!r}'.format(k, v) for k, v in sorted(kwargs.items())
+              if isinstance(v, (str, int, float))]
+    return '({})'.format(', '.join(labels)) if labels else ''
+
+
+def render_batch(jobs, out_dir, fmt='pdf', max_workers=None, use_cache=True):
+    """
+    Render independent figures headlessly, spread over a process pool
+
+    Params
+    ------
+    jobs : list of tuple of (function, tuple, dict)
+        Plotting function, positional args, & keyword args of each figure.
+        The function must be defined at module level, accept 'out_dir' &
+        'fmt' keyword args, and return the path of the saved figure
+    out_dir : str
+        Directory to save the figures to. Created if it does not exist
+    fmt : str, optional
+        Output file format, Ex: 'pdf' or 'png'. Default is 'pdf'
+    max_workers : int, optional
+        Number of worker processes. Default is the number of CPUs
+    use_cache : bool, optional
+        If True (default), skip figures whose function, input data, & plot
+        parameters hash to the same value as an existing output file
+
+    Return
+    ------
+    list of str
+        Paths of the saved figures, in the order of the jobs
+
+    A job that fails does not stop the others. The cache manifest is saved
+    with every figure that was rendered, and a RuntimeError listing each
+    failed job is then raised
+    """
+    makedirs(out_dir, exist_ok=True)
+    cache = RenderCache(out_dir) if use_cache else None
+    out_paths = [None] * len(jobs)
+    digests = [None] * len(jobs)
+    failures = []
+    futures = {}
+    t_start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for job_idx, (func, args, kwargs) in enumerate(jobs):
+                kwargs = dict(kwargs, out_dir=out_dir, fmt=fmt)
+                if (cache):
+                    digests[job_idx] = hash_inputs(func, args, kwargs)
+                    out_paths[job_idx] = cache.lookup(digests[job_idx])
+                    if (out_paths[job_idx]):
+                        continue
+                futures[executor.submit(_render_job, func, args, kwargs)] = job_idx
+            for future in as_completed(futures):
+                job_idx = futures[future]
+                try:
+                    out_path, t_render = future.result()
+                except Exception as err:
+                    job_str = '{}{}'.format(jobs[job_idx][0].__name__, _job_label(jobs[job_idx]))
+                    print('Failed to render {}: {!r}'.format(job_str, err))
+                    failures.append('{}: {!r}'.format(job_str, err))
+                    continue
+                print('Rendered {} in {:.2f} s'.format(out_path, t_render))
+                out_paths[job_idx] = out_path
+                if (cache):
+                    cache.add(digests[job_idx], out_path)
+    finally:
+        # Keep the figures that were rendered, even if the batch is cut short
+        if (cache):
+            cache.save()
+    print('Rendered {} figures in {:.2f} s'.format(len(futures) - len(failures),
+                                                   time.perf_counter() - t_start))
+    if (cache):
+        cache.report()
+    if (failures):
+        raise RuntimeError('{} of {} figures failed to render:\n  {}'.format(
+                           len(failures), len(jobs), '\n  '.join(failures)))
+    return out_paths
@@ -0,0 +1,171 @@
+"""
+Matt Nicholson
+19 Oct 2026
+
+Compare Hector output using RCMIP emissions with Hector output using default
+emissions for every RCP/SSP scenario in one run. Both sets of output files are
+loaded in parallel, aligned in a single join, and summarized with one groupby
+over (scenario, variable). The comparison figures of every scenario can also
+be rendered.
+
+Example usage
+--------------
+python sweep_rcmip.py -d version-comparison/v2_3_0 -r rcmip-output -o sweep --figures
+"""
+import argparse
+import warnings
+import matplotlib
+matplotlib.use('Agg')  # Figures are only ever rendered to files
+import pandas as pd
+
+from os import makedirs
+from os.path import join
+
+from compare_rcmip import align_outputs, comparison_table, plot_variables, scenario_key
+from compare_versions import discover_outputs, load_outputs
+from plot_concentrations import plot_em_diff
+from plot_forcings import plot_forcings
+from render import render_batch
+
+# Forcing variables plotted by plot_forcings
+forcing_vars = ['Ftot', 'FCO2', 'FN2O', 'FBC', 'FOC', 'FSO2', 'FCH4']
+
+def pair_outputs(default_dir, rcmip_dir, version=None):
+    """
+    Find the default & RCMIP output files of every scenario
+
+    Params
+    ------
+    default_dir : str
+        Directory holding Hector output files using default emissions
+    rcmip_dir : str
+        Directory holding Hector output files using RCMIP emissions
+    version : str, optional
+        Only use default output of this Hector version, Ex: '2.3.0'. Required
+        if default_dir holds output of more than one version
+
+    Return
+    ------
+    Pandas DataFrame
+        Columns: ['scenario', 'default', 'rcmip'], the scenario & the paths of
+        the default & RCMIP output files. A ValueError is raised if either
+        directory holds more than one output file of a scenario
+    """
+    default_runs = discover_outputs(default_dir)
+    if (version):
+        default_runs = default_runs[default_runs['version'] == version]
+    elif (default_runs['version'].nunique() > 1):
+        raise ValueError('Output of several Hector versions found in {}; a version '
+                         'must be given'.format(default_dir))
+    rcmip_runs = discover_outputs(rcmip_dir, require_version=False)
+    pairs = []
+    for runs in [default_runs, rcmip_runs]:
+        runs = runs.assign(scenario=runs['scenario'].map(scenario_key))
+        dupes = runs[runs.duplicated('scenario', keep=False)]
+        if (len(dupes)):
+            conflicts = ['{}: {}'.format(scenario, ' & '.join(scn_runs['path']))
+                         for scenario, scn_runs in dupes.groupby('scenario', sort=True)]
+            raise ValueError('Several output files found for the same scenario. '
+                             'Remove all but one of: {}'.format('; '.join(conflicts)))
+        pairs.append(runs.set_index('scenario')['path'])
+    pairs = pd.concat(pairs, axis=1, keys=['default', 'rcmip'], sort=True)
+    unpaired = pairs[pairs.isnull().any(axis=1)].index.tolist()
+    if (unpaired):
+        warnings.warn('Scenarios without both default & RCMIP output: {}'.format(
+                      ', '.join(unpaired)))
+    return pairs.dropna().reset_index()
+
+def sweep(pairs, vars=None, years=(1750, 2100), max_workers=None):
+    """
+    Load & align the default & RCMIP output of every scenario
+
+    Params
+    ------
+    pairs : Pandas DataFrame
+        Scenario & output file paths, Ex: returned by pair_outputs
+    vars : list of str, optional
+        Variables to compare. Default is every variable in both outputs
+    years : tuple of (int, int), optional
+        Only compare output from the years [year_min, year_max]
+    max_workers : int, optional
+        Number of loader threads. Default is one per file
+
+    Return
+    ------
+    tuple of (Pandas DataFrame, Pandas DataFrame)
+        Aligned comparison frame of every scenario (see align_outputs), &
+        its per-(scenario, variable) summary table (see comparison_table)
+    """
+    paths = pairs['default'].tolist() + pairs['rcmip'].tolist()
+    output = load_outputs(paths, years=years, vars=vars, key='path',
+                          max_workers=max_workers,
+                          versions={path: 'rcmip' for path in pairs['rcmip']})
+    frames = {}
+    for side in ['default', 'rcmip']:
+        # The file name, not the run name in the file, gives the scenario
+        frames[side] = pd.concat([output[path].output.assign(scenario=scenario)
+                                  for scenario, path in zip(pairs['scenario'], pairs[side])],
+                                 ignore_index=True, sort=False)
+    aligned = align_outputs(frames['default'], frames['rcmip'], vars=vars, years=years)
+    return (aligned, comparison_table(aligned))
+
+def figure_jobs(aligned, years=(1750, 2100)):
+    """
+    Build render_batch jobs for the comparison figures of every scenario
+
+    Params
+    ------
+    aligned : Pandas DataFrame
+        Aligned comparison frame returned by sweep
+    years : tuple of (int, int), optional
+        Years to plot
+
+    Return
+    ------
+    list of tuple of (function, tuple, dict)
+    """
+    jobs = []
+    for scenario, scn_df in aligned.groupby('scenario', sort=True, observed=True):
+        scn_df = scn_df.reset_index(drop=True)
+        vars = scn_df['variable'].unique().tolist()
+        kwargs = {'years': years, 'scenario': scenario.upper()}
+        jobs.append((plot_variables, (scn_df, vars), kwargs))
+        jobs.append((plot_forcings, (scn_df, [v for v in forcing_vars if v in vars]), kwargs))
+        jobs.append((plot_em_diff, (scn_df, vars), kwargs))
+    return jobs
+
+# ==================================== Main ====================================
+
+if __name__ == '__main__':
+    parse_desc = """Compare RCMIP & default Hector output for every scenario"""
+    parser = argparse.ArgumentParser(description=parse_desc)
+    parser.add_argument('-d', '--default-dir', dest='default_dir', required=True,
+                        action='store', help='Directory of default-emission Hector output')
+    parser.add_argument('-r', '--rcmip-dir', dest='rcmip_dir', required=True,
+                        action='store', help='Directory of RCMIP-emission Hector output')
+    parser.add_argument('-o', '--out-dir', dest='out_dir', required=True,
+                        action='store', help='Directory for the summary table & figures')
+    parser.add_argument('--version', dest='version', default=None, action='store',
+                        help='Hector version of the default output, Ex: 2.3.0')
+    parser.add_argument('-v', '--vars', dest='vars', nargs='+', default=None,
+                        action='store', help='Variables to compare')
+    parser.add_argument('-y', '--years', dest='years', nargs=2, type=int, default=(1750, 2100),
+                        action='store', help='First & last year to compare')
+    parser.add_argument('--figures', dest='figures', action='store_true',
+                        help='Also render the comparison figures of every scenario')
+    parser.add_argument('--fmt', dest='fmt', default='pdf', action='store',
+                        help='Figure file format')
+    parser.add_argument('-n', '--workers', dest='workers', type=int, default=None,
+                        action='store', help='Number of loader threads & rendering processes')
+    args = parser.parse_args()
+
+    pairs = pair_outputs(args.default_dir, args.rcmip_dir, version=args.version)
+    aligned, table = sweep(pairs, vars=args.vars, years=tuple(args.years),
+                           max_workers=args.workers)
+    makedirs(args.out_dir, exist_ok=True)
+    out_path = join(args.out_dir, 'rcmip-comparison-summary.csv')
+    table.to_csv(out_path, sep=',', header=True, index=False)
+    print('Summary table written to {}'.format(out_path))
+    if (args.figures):
+        render_batch(figure_jobs(aligned, years=tuple(args.years)), args.out_dir,
+                     fmt=args.fmt, max_workers=args.workers)
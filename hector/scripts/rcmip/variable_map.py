@@ -0,0 +1,171 @@
+"""
+Matt Nicholson
+19 Oct 2026
+
+Compiled RCMIP <--> Hector variable mapping, built from the
+variable-conversion.csv look up table. Lookups in either direction are
+dictionary lookups, and the compiled mapping is cached on disk next to the
+look up table.
+"""
+import pickle
+import pandas as pd
+
+from collections import namedtuple
+from os import replace, stat
+from os.path import exists
+
+# Columns of variable-conversion.csv
+lut_cols = ['hector_component', 'hector_variable', 'hector_unit', 'hector_udunits',
+            'rcmip_variable', 'rcmip_units', 'rcmip_udunits']
+
+# Version of the compiled mapping layout. Cached mappings of another version
+# are recompiled
+cache_version = 2
+
+# One row of the look up table
+VarConversion = namedtuple('VarConversion', lut_cols)
+
+# Optional column of variable-conversion.csv that flags the row describing a
+# Hector variable built from more than one RCMIP variable (unit, etc.), Ex:
+# 'Emissions|CO2|MAGICC Fossil and Industrial' for 'ffi_emissions'. Hector
+# variables without a flagged row use their first row
+primary_col = 'primary'
+
+# Values of primary_col that flag a row
+primary_true = ['1', 'true', 'yes', 'y', 'x']
+
+class VariableMap:
+    """
+    Bidirectional mapping between RCMIP & Hector variables
+    """
+
+    def __init__(self, lut_df):
+        """
+        Constructor for the VariableMap class
+
+        Params
+        ------
+        lut_df : Pandas DataFrame
+            RCMIP to Hector variable look up table. If it has a 'primary'
+            column, the flagged row of each Hector variable is its primary row
+        """
+        if (primary_col in lut_df.columns):
+            flags = lut_df[primary_col]
+            is_primary = (flags.astype(str).str.strip().str.lower().isin(primary_true) |
+                          (pd.to_numeric(flags, errors='coerce') == 1)).tolist()
+        else:
+            is_primary = [False] * len(lut_df)
+        lut_df = lut_df[lut_cols].astype(str)
+        self._rows = [VarConversion(*row) for row in lut_df.itertuples(index=False)]
+        self._by_hector = {}
+        self._rcmip_rows  = {}
+        self._hector_rows = {}
+        primary = {}
+        for row, row_primary in zip(self._rows, is_primary):
+            self._rcmip_rows.setdefault(row.rcmip_variable, []).append(row)
+            self._hector_rows.setdefault(row.hector_variable, []).append(row)
+            if (row_primary):
+                if (row.hector_variable in primary):
+                    raise ValueError("Hector variable '{}' has more than one primary "
+                                     "row".format(row.hector_variable))
+                primary[row.hector_variable] = row
+        for hector_var, rows in self._hector_rows.items():
+            self._by_hector[hector_var] = primary.get(hector_var, rows[0])
+
+    @classmethod
+    def from_csv(cls, path, cache=True):
+        """
+        Compile the mapping from a variable-conversion.csv file. The compiled
+        mapping is cached in '<path>.pkl' & re-used until the file changes
+
+        Params
+        ------
+        path : str
+            Path of the look up table
+        cache : bool, optional
+            If False, always compile from the look up table. Default is True
+
+        Return
+        ------
+        VariableMap
+        """
+        cache_path = path + '.pkl'
+        f_stat = stat(path)
+        key = (f_stat.st_mtime, f_stat.st_size, cache_version)
+        if (cache and exists(cache_path)):
+            with open(cache_path, 'rb') as f_in:
+                cache_key, var_map = pickle.load(f_in)
+            if (cache_key == key):
+                return var_map
+        lut_df = pd.read_csv(path, sep=',', header=0, skipinitialspace=True)
+        var_map = cls(lut_df)
+        if (cache):
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'wb') as f_out:
+                pickle.dump((key, var_map), f_out, protocol=pickle.HIGHEST_PROTOCOL)
+            replace(tmp_path, cache_path)
+        return var_map
+
+    @property
+    def hector_variables(self):
+        return list(self._by_hector.keys())
+
+    @property
+    def rcmip_variables(self):
+        return list(self._rcmip_rows.keys())
+
+    def by_hector(self, hector_var):
+        """
+        Get the conversion row of a Hector variable
+
+        Return
+        ------
+        VarConversion
+            Attributes: hector_component, hector_variable, hector_unit,
+                        hector_udunits, rcmip_variable, rcmip_units, rcmip_udunits
+        """
+        return self._by_hector[hector_var]
+
+    def by_rcmip(self, rcmip_var):
+        """
+        Get the conversion row of a RCMIP variable. A ValueError is raised if
+        the RCMIP variable maps to more than one Hector variable; use
+        rcmip_rows to get all of them
+
+        Return
+        ------
+        VarConversion
+        """
+        rows = self._rcmip_rows[rcmip_var]
+        if (len(rows) > 1):
+            raise ValueError("RCMIP variable '{}' maps to several Hector variables: {}".format(
+                             rcmip_var, ', '.join(row.hector_variable for row in rows)))
+        return rows[0]
+
+    def rcmip_rows(self, rcmip_var):
+        """
+        Get every conversion row of a RCMIP variable, one per Hector variable
+        it maps to
+
+        Return
+        ------
+        list of VarConversion
+        """
+        return list(self._rcmip_rows[rcmip_var])
+
+    def hector_rows(self, hector_var):
+        """
+        Get every conversion row of a Hector variable, Ex: each RCMIP
+        variable that makes up 'ffi_emissions'
+
+        Return
+        ------
+        list of VarConversion
+        """
+        return list(self._hector_rows[hector_var])
+
+    def to_frame(self):
+        """
+        Get the look up table as a DataFrame
+        """
+        return pd.DataFrame(self._rows, columns=lut_cols)
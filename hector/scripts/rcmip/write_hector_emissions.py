@@ -0,0 +1,180 @@
+"""
+Matt Nicholson
+19 Oct 2026
+
+Write Hector input emissions files for RCMIP scenarios. The RCMIP emissions
+of every scenario are converted to Hector variables & units with the
+variable-conversion.csv look up table and written in the same format as
+Hector's inst/input/emissions/*_emissions.csv files: three header lines
+followed by a 'Date' column & one column per Hector emissions variable.
+Scenarios are converted in parallel worker processes, and every file is
+written to a temporary file first & then moved into place.
+
+Example usage
+--------------
+python write_hector_emissions.py -e rcmip-emissions-annual-means-v3-1-0.csv
+                                 -l variable-conversion.csv -o emissions -s rcp45 ssp370
+"""
+import argparse
+import sys
+import time
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import makedirs, replace
+from os.path import join, basename
+
+from plot_ems import conversion_table, scenario_emissions
+from rcmip_emissions import RCMIPEmissions
+from variable_map import VariableMap
+
+def _year_ranges(years):
+    """
+    Format sorted years as ranges, Ex: '1750-1759, 2101'
+    """
+    ranges = []
+    for year in years:
+        if (ranges and year == ranges[-1][1] + 1):
+            ranges[-1][1] = year
+        else:
+            ranges.append([year, year])
+    return ', '.join(str(lo) if lo == hi else '{}-{}'.format(lo, hi) for lo, hi in ranges)
+
+def write_emissions(hector_df, out_path, scenario, units, source=''):
+    """
+    Write a Hector emissions table to a Hector input emissions file. The file
+    is written to '<out_path>.tmp' & then moved to out_path, so that a
+    partially written file is never left at out_path. Hector cannot read
+    empty cells, so years without a value for every variable are left out
+    & listed in the file header; Hector interpolates over them
+
+    Params
+    ------
+    hector_df : Pandas DataFrame
+        Hector emissions table returned by scenario_emissions
+    out_path : str
+        Path of the emissions file
+    scenario : str
+        Scenario name, written to the file header
+    units : dict of {str: str}
+        Unit of each Hector variable, written to the file header
+    source : str, optional
+        Source of the emissions, written to the file header
+
+    Return
+    ------
+    str
+        out_path
+    """
+    header = ['; {} emissions'.format(scenario),
+              '; Source: {}'.format(source),
+              '; Units: {}'.format(', '.join('{} ({})'.format(var, units[var])
+                                             for var in hector_df.columns[1:]))]
+    missing = hector_df.iloc[:, 1:].isna()
+    if (missing.to_numpy().any()):
+        gaps = ['{} {}'.format(var, _year_ranges(hector_df.loc[missing[var], 'Date'].tolist()))
+                for var in missing.columns[missing.any().to_numpy()]]
+        header[1] += '; years missing a value are left out: {}'.format('; '.join(gaps))
+        hector_df = hector_df.loc[~missing.any(axis=1).to_numpy()]
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'w', newline='') as f_out:
+        f_out.write('\n'.join(header) + '\n')
+        hector_df.to_csv(f_out, sep=',', header=True, index=False)
+    replace(tmp_path, out_path)
+    return out_path
+
+def _write_scenario(rcmip_df, scenario, conv_table, units, out_dir, years, source):
+    """
+    Convert & write the emissions of one scenario. Helper function for
+    write_scenarios
+
+    Return
+    ------
+    tuple of (str, float)
+        Path of the emissions file & the time taken in seconds
+    """
+    t_start = time.perf_counter()
+    hector_df = scenario_emissions(rcmip_df, conv_table, years=years)
+    out_path = join(out_dir, '{}_emissions.csv'.format(scenario))
+    write_emissions(hector_df, out_path, scenario, units, source=source)
+    return (out_path, time.perf_counter() - t_start)
+
+def write_scenarios(rcmip_path, var_map, out_dir, scenarios=None, years=None,
+                    max_workers=None):
+    """
+    Write Hector input emissions files for RCMIP scenarios in parallel. A
+    ValueError is raised, before any file is written, if a scenario has no
+    global emissions in the RCMIP file
+
+    Params
+    ------
+    rcmip_path : str
+        Path of the wide RCMIP emissions file
+    var_map : VariableMap
+        RCMIP to Hector variable mapping
+    out_dir : str
+        Directory to write the files to, one '<scenario>_emissions.csv' per
+        scenario
+    scenarios : list of str, optional
+        Scenarios to write. Default is every scenario in the RCMIP file
+    years : tuple of (int, int), optional
+        Only write the years [year_min, year_max]
+    max_workers : int, optional
+        Number of worker processes. Default is the number of CPUs
+
+    Return
+    ------
+    list of str
+        Paths of the emissions files, in the order of the scenarios
+    """
+    if (not scenarios):
+        scenarios = pd.read_csv(rcmip_path, sep=',', usecols=['Scenario'])['Scenario'].unique().tolist()
+    # Melt every uncached scenario in one pass & hand each worker its scenario
+    rcmip_df = RCMIPEmissions(rcmip_path).load(scenarios, regions='World')
+    scn_dfs = dict(tuple(rcmip_df.groupby('Scenario', sort=False, observed=True)))
+    missing = [scenario for scenario in scenarios if scenario not in scn_dfs]
+    if (missing):
+        raise ValueError('Scenarios with no global emissions in {}: {}'.format(
+                         basename(rcmip_path), ', '.join(missing)))
+    makedirs(out_dir, exist_ok=True)
+    source = '{}, converted with variable-conversion.csv'.format(basename(rcmip_path))
+    conv_table = conversion_table(var_map)
+    units = {var: var_map.by_hector(var).hector_unit for var in var_map.hector_variables}
+    out_paths = {}
+    t_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_write_scenario, scn_dfs[scenario], scenario, conv_table,
+                                   units, out_dir, years, source): scenario
+                   for scenario in scenarios}
+        for future in as_completed(futures):
+            out_path, t_write = future.result()
+            print('Wrote {} in {:.2f} s'.format(out_path, t_write))
+            out_paths[futures[future]] = out_path
+    print('Wrote {} scenarios in {:.2f} s'.format(len(scenarios), time.perf_counter() - t_start))
+    return [out_paths[scenario] for scenario in scenarios]
+
+# ==================================== Main ====================================
+
+if __name__ == '__main__':
+    parse_desc = """Write Hector input emissions files for RCMIP scenarios"""
+    parser = argparse.ArgumentParser(description=parse_desc)
+    parser.add_argument('-e', '--emissions', dest='rcmip_path', required=True,
+                        action='store', help='Path of the RCMIP emissions file')
+    parser.add_argument('-l', '--lut', dest='lut_path', default='variable-conversion.csv',
+                        action='store', help='Path of the variable conversion table')
+    parser.add_argument('-o', '--out-dir', dest='out_dir', required=True,
+                        action='store', help='Directory to write the emissions files to')
+    parser.add_argument('-s', '--scenarios', dest='scenarios', nargs='+', default=None,
+                        action='store', help='Scenarios to write. Default is all')
+    parser.add_argument('-y', '--years', dest='years', nargs=2, type=int, default=None,
+                        action='store', help='First & last year to write')
+    parser.add_argument('-n', '--workers', dest='workers', type=int, default=None,
+                        action='store', help='Number of worker processes')
+    args = parser.parse_args()
+
+    var_map = VariableMap.from_csv(args.lut_path)
+    try:
+        write_scenarios(args.rcmip_path, var_map, args.out_dir, scenarios=args.scenarios,
+                        years=args.years, max_workers=args.workers)
+    except ValueError as err:
+        sys.exit('write_hector_emissions: {}'.format(err))
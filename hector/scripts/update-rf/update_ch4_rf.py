@@ -139,52 +139,33 @@ def calc_all_rf(emissions, year_start, year_end):
     Pandas DataFrame containing radiative forcings
         Columns: ['year', 'rf_co2', 'rf_ch4', 'rf_n2o']
     """
-    yr_span = (year_end - year_start) + 1  # +1 since the span is inclusive
+    years = np.arange(year_start, year_end + 1)
     
-    # initialize dict val lists to their final size 
-    rf_dict = {'year': [None] * yr_span,
-               'rf_co2': [None] * yr_span,
-               'rf_ch4': [None] * yr_span,
-               'rf_n2o': [None] * yr_span
-               }
-               
     # Check the formatting of the emissions dataframe
     validate_em_vars(emissions)
     
-    # Get a dataframe for each of the three emission species
-    em_c = emissions.loc[emissions['variable'] == 'Ca']     # CO2
-    em_m = emissions.loc[emissions['variable'] == 'CH4']    # CH4
-    em_n = emissions.loc[emissions['variable'] == 'N2O']    # CH4
+    # Get the concentrations of each of the three species for every year
+    c_curr = get_yearly_values(emissions, 'Ca', years)     # CO2
+    m_curr = get_yearly_values(emissions, 'CH4', years)    # CH4
+    n_curr = get_yearly_values(emissions, 'N2O', years)    # N2O
     
     # Set the initial concentration values
-    c_0 = em_c.loc[em_c['year'] == year_start].value.iloc[0]    # CO2_0
-    m_0 = em_m.loc[em_m['year'] == year_start].value.iloc[0]    # CH4_0
-    n_0 = em_n.loc[em_n['year'] == year_start].value.iloc[0]    # N2O_0
+    c_0 = c_curr[0]    # CO2_0
+    m_0 = m_curr[0]    # CH4_0
+    n_0 = n_curr[0]    # N2O_0
     
     print('Calculating updated RFs for CO2, CH4, & N2O...')
     
-    # Set upper bound to year_end + 1 due to how range() handles upper bounds
-    for idx, year in enumerate(range(year_start, year_end + 1)):
-        
-        # Get the nominal concentrations for the current year
-        c_curr = em_c.loc[em_c['year'] == year].value.iloc[0]
-        m_curr = em_m.loc[em_m['year'] == year].value.iloc[0]
-        n_curr = em_n.loc[em_n['year'] == year].value.iloc[0]
-        
-        # Calculate the averaged concentrations
-        c_bar = calc_cbar(c_0, c_curr)
-        m_bar = calc_mbar(m_0, m_curr)
-        n_bar = calc_nbar(n_0, n_curr)
-        
-        # Calculate the radiative forcings for the current year
-        rf_c = calc_rf_co2(c_0, c_curr, n_bar)                  # co2 RF
-        rf_m = calc_rf_ch4(m_0, m_curr, m_bar, n_bar)           # ch4 RF
-        rf_n = calc_rf_n2o(n_0, n_curr, c_bar, n_bar, m_bar)    # n2o RF
-        
-        rf_dict['year'][idx] = year
-        rf_dict['rf_co2'][idx] = rf_c     # co2 RF
-        rf_dict['rf_ch4'][idx] = rf_m     # ch4 RF
-        rf_dict['rf_n2o'][idx] = rf_n     # n2o RF
+    # Calculate the averaged concentrations for every year at once
+    c_bar = calc_cbar(c_0, c_curr)
+    m_bar = calc_mbar(m_0, m_curr)
+    n_bar = calc_nbar(n_0, n_curr)
+    
+    rf_dict = {'year': years,
+               'rf_co2': calc_rf_co2(c_0, c_curr, n_bar),                  # co2 RF
+               'rf_ch4': calc_rf_ch4(m_0, m_curr, m_bar, n_bar),           # ch4 RF
+               'rf_n2o': calc_rf_n2o(n_0, n_curr, c_bar, n_bar, m_bar)     # n2o RF
+               }
     
     print('Constructing RF DataFrame...\n')
     rf_df = pd.DataFrame.from_dict(rf_dict, orient='columns')
@@ -219,6 +200,34 @@ def validate_em_vars(emissions):
         assert var in em_vars, assert_str.format(var)
     
     
+def get_yearly_values(emissions, var, years):
+    """
+    Helper function for calc_all_rf
+
+    Get the value of an emission variable for each of the given years. The
+    first row of each year is used
+
+    Parameters
+    -----------
+    emissions : Pandas DataFrame
+        Emissions used to calculate the radiative forcings
+    var : str
+        Emission variable, Ex: 'Ca'
+    years : Numpy array of int
+        Years to get the values of
+
+    Return
+    -------
+    Numpy array of float
+    """
+    em_var = emissions.loc[emissions['variable'] == var]
+    em_var = em_var.drop_duplicates('year', keep='first').set_index('year')['value']
+    missing = [year for year in years if year not in em_var.index]
+    if (missing):
+        raise ValueError('Var {} has no value for years {}'.format(var, missing))
+    return em_var.reindex(years).to_numpy(dtype=float)
+    
+    
 def within_range(year_start, year_end, year_x):
     """
     Check if year_x is within the time span defined by [year_start, year_end]